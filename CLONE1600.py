@@ -1,27 +1,23 @@
-from pyNastran.bdf.bdf import read_bdf
-from pyNastran.op2.op2 import read_op2
-from pyNastran.bdf.mesh_utils.mass_properties import mass_properties
-import pandas as pd
-import os, subprocess, psutil
-import time
+import os, time, bisect
+STARTUP_T0 = time.perf_counter()
 import numpy as np
-from skopt import gp_minimize, gbrt_minimize
-from scipy.optimize import differential_evolution
-from skopt.space import Real
+from clone1600_engine import (JOB_ROOT, RUN_ROOT, RESPONSE_FILE, KEEP_ROOT, CHECKPOINT_DIR, MODEL_CACHE, ResponseStore,
+                              ObjectiveExpression, StudyConfig, OptimizationEngine, response_variable_names,
+                              select_properties, rescore_responses, best_so_far, latest_checkpoint)
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                                 QHBoxLayout, QLabel, QLineEdit, QPushButton, 
                                 QTextEdit, QProgressBar, QRadioButton, QCheckBox,
                                 QComboBox, QFileDialog, QMessageBox, QGroupBox,
                                 QFrame, QSplitter, QButtonGroup)
-from PySide6.QtCore import Qt, QThread, Signal, Slot
+from PySide6.QtCore import Qt, QThread, Signal, Slot, QTimer
 from PySide6.QtGui import QFont
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg
-from matplotlib.figure import Figure
-import pyvista as pv
-from pyvistaqt import QtInteractor
+# pyNastran, matplotlib and pyvista are imported when the first model or plot is shown
 os.environ['QT_API'] = 'pyside6'
 
+# Seconds from launch until the main window is up, reported by report_startup
+STARTUP_BUDGET = 2.0
+
+
 class NastranOptimizerGUI(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -44,7 +40,7 @@ class NastranOptimizerGUI(QMainWindow):
         self.best_result_value = None
         self.best_bdf_name = None
         self.initial_mass = None
-        self.load_case = None
+        self.resume_dir = None
         
         self.node_labels_visible = False
         self.element_labels_visible = False
@@ -135,6 +131,18 @@ class NastranOptimizerGUI(QMainWindow):
         open_bdf_action.setShortcut("Ctrl+O")
         open_bdf_action.triggered.connect(self.browse_file)
         
+        open_study_action = file_menu.addAction("📄 Open Study...")
+        open_study_action.triggered.connect(self.open_study)
+        
+        save_study_action = file_menu.addAction("💾 Save Study...")
+        save_study_action.triggered.connect(self.save_study)
+        
+        resume_action = file_menu.addAction("⏯️ Resume Study...")
+        resume_action.triggered.connect(self.resume_study)
+        
+        reevaluate_action = file_menu.addAction("🔁 Re-evaluate History...")
+        reevaluate_action.triggered.connect(self.reevaluate_history)
+        
         file_menu.addSeparator()
         
         exit_action = file_menu.addAction("❌ Exit")
@@ -207,6 +215,8 @@ class NastranOptimizerGUI(QMainWindow):
             "<h3 style='text-align: left;'>Quick Start Guide</h3>"
             "<p style='text-align: left;'><b>1. Load BDF File:</b> Use File → Open BDF File or Browse button</p>"
             "<p style='text-align: left;'><b>2. Set Variables:</b> Enter node/element IDs to monitor (comma-separated)</p>"
+            "<p style='text-align: left;'>• Sets: <i>name: 100-200, 305</i> (separated by ';') adds max_name, min_name, "
+            "mean_name, rms_name, sum_name and argmax_name</p>"
             "<p style='text-align: left;'><b>3. Configure Target:</b> Choose result type, component, and optimization mode</p>"
             "<p style='text-align: left;'><b>4. Run Optimization:</b> Click 'Start Optimization' button</p>"
             "<p style='text-align: left;'></p>"
@@ -218,7 +228,15 @@ class NastranOptimizerGUI(QMainWindow):
             "<p style='text-align: left;'><b>Tips:</b></p>"
             "<p style='text-align: left;'>• Use 'All' for properties to optimize all available properties</p>"
             "<p style='text-align: left;'>• Enable Mass Penalty to control mass changes during optimization</p>"
-            "<p style='text-align: left;'>• Results are automatically saved to RESULTS.xlsx</p>"
+            "<p style='text-align: left;'>• Each run gets its own directory in opt_runs with the checkpoint, the best "
+            "designs (opt_best) and the stored responses, so earlier runs are never overwritten</p>"
+            "<p style='text-align: left;'>• The full history is stored column by column in opt_checkpoint while the run "
+            "progresses; a summary of the best designs and status counts is saved to RESULTS.xlsx in the run "
+            "directory at the end (Output → RESULTS.xlsx)</p>"
+            "<p style='text-align: left;'>• Every evaluation is checkpointed to opt_checkpoint; File → Resume Study "
+            "restores its settings and continues the run without re-solving finished designs</p>"
+            "<p style='text-align: left;'>• File → Re-evaluate History re-scores the responses stored in opt_responses.npz "
+            "with the current objective, mode, target and mass penalty, without running Nastran</p>"
         )
         help_dialog.setStyleSheet("""
             QMessageBox {
@@ -233,7 +251,7 @@ class NastranOptimizerGUI(QMainWindow):
 
     def toggle_node_labels(self):
         """Toggle node ID labels visibility"""
-        if not self.plotter:
+        if not self.get_plotter():
             if hasattr(self, 'node_labels_action'):
                 self.node_labels_action.setChecked(False)
             return
@@ -251,7 +269,7 @@ class NastranOptimizerGUI(QMainWindow):
 
     def toggle_element_labels(self):
         """Toggle element ID labels visibility"""
-        if not self.plotter:
+        if not self.get_plotter():
             if hasattr(self, 'element_labels_action'):
                 self.element_labels_action.setChecked(False)
             return
@@ -273,21 +291,17 @@ class NastranOptimizerGUI(QMainWindow):
             return
         
         try:
-            bdf = read_bdf(self.bdf_path.text())
+            model = MODEL_CACHE.get(self.bdf_path.text())
             
             # Remove old labels first
             self.remove_node_labels()
             
-            # Collect ALL positions and labels at once
-            positions = []
-            labels = []
-            
-            for nid, node in bdf.nodes.items():
-                positions.append(node.get_position())
-                labels.append(str(nid))
+            # ALL positions and labels at once, from the cached model
+            positions = model.coords
+            labels = model.node_ids.astype(str).tolist()
             
             # Single batch call with AGGRESSIVE optimization settings
-            if positions:
+            if len(positions):
                 actor = self.plotter.add_point_labels(
                     positions, 
                     labels,
@@ -317,30 +331,18 @@ class NastranOptimizerGUI(QMainWindow):
             return
         
         try:
-            bdf = read_bdf(self.bdf_path.text())
+            model = MODEL_CACHE.get(self.bdf_path.text())
             
             # Remove old labels first
             self.remove_element_labels()
             
-            # Collect ALL centroids and labels at once
-            positions = []
-            labels = []
-            
-            for eid, elem in bdf.elements.items():
-                try:
-                    # Calculate element centroid
-                    node_ids = elem.node_ids
-                    elem_positions = [bdf.nodes[nid].get_position() for nid in node_ids if nid in bdf.nodes]
-                    
-                    if elem_positions:
-                        centroid = np.mean(elem_positions, axis=0)
-                        positions.append(centroid)
-                        labels.append(str(eid))
-                except:
-                    continue
+            # ALL centroids and labels at once, from the cached model
+            has_nodes = ~np.isnan(model.centroids).any(axis=1)
+            positions = model.centroids[has_nodes]
+            labels = model.element_ids[has_nodes].astype(str).tolist()
             
             # Single batch call with AGGRESSIVE optimization
-            if positions:
+            if len(positions):
                 actor = self.plotter.add_point_labels(
                     positions, 
                     labels,
@@ -518,6 +520,18 @@ class NastranOptimizerGUI(QMainWindow):
         self.variables = QLineEdit("2143, 225")
         var_layout.addWidget(self.variables)
         vars_layout.addLayout(var_layout)
+
+        # Named response sets with aggregate variables
+        sets_layout = QHBoxLayout()
+        sets_label = QLabel("Sets:")
+        sets_label.setMinimumWidth(100)
+        sets_layout.addWidget(sets_label)
+        self.response_sets = QLineEdit("")
+        self.response_sets.setPlaceholderText("e.g. top: 10000-250000; bolts: 501, 502-510")
+        self.response_sets.setToolTip("Each set adds max_, min_, mean_, rms_, sum_ and argmax_<name> "
+                                      "to the objective function")
+        sets_layout.addWidget(self.response_sets)
+        vars_layout.addLayout(sets_layout)
         
         # Method
         method_layout = QHBoxLayout()
@@ -559,7 +573,147 @@ class NastranOptimizerGUI(QMainWindow):
         
         vars_group.setLayout(vars_layout)
         left_layout.addWidget(vars_group)
-        
+
+        # SOLVER Section
+        solver_group = QGroupBox("⚙️ SOLVER")
+        solver_group.setStyleSheet("QGroupBox { font-weight: bold; }")
+        solver_layout = QVBoxLayout()
+
+        # Max concurrent solves
+        solves_layout = QHBoxLayout()
+        solves_label = QLabel("Max Solves:")
+        solves_label.setMinimumWidth(100)
+        solves_layout.addWidget(solves_label)
+        self.max_solves = QLineEdit("1")
+        self.max_solves.setMaximumWidth(45)
+        self.max_solves.setToolTip("Maximum number of Nastran jobs running at the same time")
+        solves_layout.addWidget(self.max_solves)
+        solves_layout.addWidget(QLabel("Timeout (s):"))
+        self.solve_timeout = QLineEdit("3600")
+        self.solve_timeout.setMaximumWidth(60)
+        self.solve_timeout.setToolTip("Wall-clock limit per solve, the job is killed when it expires (0 = no limit)")
+        solves_layout.addWidget(self.solve_timeout)
+        solves_layout.addWidget(QLabel("Retries:"))
+        self.solve_retries = QLineEdit("1")
+        self.solve_retries.setMaximumWidth(45)
+        solves_layout.addWidget(self.solve_retries)
+        solves_layout.addStretch()
+        solver_layout.addLayout(solves_layout)
+
+        # Memory used for retries
+        retry_layout = QHBoxLayout()
+        retry_label = QLabel("Retry Memory:")
+        retry_label.setMinimumWidth(100)
+        retry_layout.addWidget(retry_label)
+        self.retry_memory = QLineEdit("")
+        self.retry_memory.setPlaceholderText("e.g. 8gb, 16gb (one per retry, empty = unchanged)")
+        retry_layout.addWidget(self.retry_memory)
+        solver_layout.addLayout(retry_layout)
+
+        # Job directories and Nastran scratch
+        dirs_layout = QHBoxLayout()
+        dirs_label = QLabel("Job Root:")
+        dirs_label.setMinimumWidth(100)
+        dirs_layout.addWidget(dirs_label)
+        self.job_root = QLineEdit(JOB_ROOT)
+        self.job_root.setToolTip("Directory for the per-iteration job directories, e.g. a RAM disk or local SSD")
+        dirs_layout.addWidget(self.job_root)
+        dirs_layout.addWidget(QLabel("Scratch:"))
+        self.scratch_dir = QLineEdit("")
+        self.scratch_dir.setPlaceholderText("sdirectory (empty = default)")
+        self.scratch_dir.setToolTip("Local scratch directory passed to Nastran as sdirectory")
+        dirs_layout.addWidget(self.scratch_dir)
+        solver_layout.addLayout(dirs_layout)
+
+        # Retained designs
+        keep_layout = QHBoxLayout()
+        keep_label = QLabel("Keep Best:")
+        keep_label.setMinimumWidth(100)
+        keep_layout.addWidget(keep_label)
+        self.keep_best = QLineEdit("5")
+        self.keep_best.setMaximumWidth(45)
+        self.keep_best.setToolTip(f"Number of best designs whose job files are kept in {RUN_ROOT}/<run>/{KEEP_ROOT}")
+        keep_layout.addWidget(self.keep_best)
+        self.compress_kept = QCheckBox("Compress demoted designs")
+        self.compress_kept.setToolTip("Zip the files of a kept design once a better design replaces it")
+        keep_layout.addWidget(self.compress_kept)
+        keep_layout.addStretch()
+        solver_layout.addLayout(keep_layout)
+
+        # Warm start from an earlier run
+        warm_layout = QHBoxLayout()
+        warm_label = QLabel("Warm Start:")
+        warm_label.setMinimumWidth(100)
+        warm_layout.addWidget(warm_label)
+        self.warm_start = QLineEdit("")
+        self.warm_start.setPlaceholderText("response store (.npz) of an earlier run, empty = none")
+        self.warm_start.setToolTip("Designs of an earlier run on the same deck and properties are re-scored with "
+                                   "the current objective and seed the optimizer without being solved again")
+        warm_layout.addWidget(self.warm_start)
+        warm_btn = QPushButton("Browse")
+        warm_btn.setMaximumWidth(80)
+        warm_btn.clicked.connect(self.browse_warm_start)
+        warm_layout.addWidget(warm_btn)
+        solver_layout.addLayout(warm_layout)
+
+        # Evaluation cache
+        cache_layout = QHBoxLayout()
+        cache_label = QLabel("Cache:")
+        cache_label.setMinimumWidth(100)
+        cache_layout.addWidget(cache_label)
+        self.use_cache = QCheckBox("Enable")
+        self.use_cache.setChecked(True)
+        self.use_cache.toggled.connect(self.update_cache_state)
+        cache_layout.addWidget(self.use_cache)
+        cache_layout.addWidget(QLabel("Tol:"))
+        self.cache_tolerance = QLineEdit("1e-4")
+        self.cache_tolerance.setMaximumWidth(60)
+        self.cache_tolerance.setToolTip("Multipliers closer than this are treated as the same design")
+        cache_layout.addWidget(self.cache_tolerance)
+        cache_layout.addWidget(QLabel("Max:"))
+        self.cache_size = QLineEdit("100000")
+        self.cache_size.setMaximumWidth(70)
+        self.cache_size.setToolTip("Maximum number of cached designs, least recently used are evicted")
+        cache_layout.addWidget(self.cache_size)
+        cache_layout.addStretch()
+        solver_layout.addLayout(cache_layout)
+
+        # Deck writing mode
+        deck_layout = QHBoxLayout()
+        deck_label = QLabel("Deck:")
+        deck_label.setMinimumWidth(100)
+        deck_layout.addWidget(deck_label)
+        self.incremental_decks = QCheckBox("Incremental (master deck + INCLUDE of edited properties)")
+        self.incremental_decks.setToolTip("Write the unchanged model once and only the edited property cards per iteration")
+        deck_layout.addWidget(self.incremental_decks)
+        deck_layout.addWidget(QLabel("Mass Check:"))
+        self.mass_check_every = QLineEdit("0")
+        self.mass_check_every.setMaximumWidth(45)
+        self.mass_check_every.setToolTip("Verify the analytic mass with a full mass_properties run every N iterations (0 = never)")
+        deck_layout.addWidget(self.mass_check_every)
+        deck_layout.addStretch()
+        solver_layout.addLayout(deck_layout)
+
+        # Output requests
+        output_layout = QHBoxLayout()
+        output_label = QLabel("Output:")
+        output_label.setMinimumWidth(100)
+        output_layout.addWidget(output_label)
+        self.trim_output = QCheckBox("Trim to monitored IDs (PLOT only, no F06 print)")
+        self.trim_output.setToolTip("Rewrite the case control so each solve only outputs the result table and IDs "
+                                    "the objective needs")
+        output_layout.addWidget(self.trim_output)
+        self.excel_report = QCheckBox("RESULTS.xlsx")
+        self.excel_report.setChecked(True)
+        self.excel_report.setToolTip("Write a summary workbook to the run directory when the run finishes; the full history is always "
+                                     f"stored in {RUN_ROOT}/<run>/{CHECKPOINT_DIR}")
+        output_layout.addWidget(self.excel_report)
+        output_layout.addStretch()
+        solver_layout.addLayout(output_layout)
+
+        solver_group.setLayout(solver_layout)
+        left_layout.addWidget(solver_group)
+
         # TARGET Section
         target_group = QGroupBox("🎯 TARGET")
         target_group.setStyleSheet("QGroupBox { font-weight: bold; }")
@@ -647,6 +801,29 @@ class NastranOptimizerGUI(QMainWindow):
         mass_layout.addWidget(self.mass_penalty_factor)
         mass_layout.addStretch()
         target_layout.addLayout(mass_layout)
+
+        # Mass Limit (checked before any solve)
+        limit_layout = QHBoxLayout()
+        limit_label = QLabel("Mass Limit:")
+        limit_label.setMinimumWidth(100)
+        limit_layout.addWidget(limit_label)
+        self.use_mass_limit = QCheckBox("Enable")
+        self.use_mass_limit.toggled.connect(self.update_mass_limit_state)
+        limit_layout.addWidget(self.use_mass_limit)
+        limit_layout.addWidget(QLabel("Max:"))
+        self.mass_limit_value = QLineEdit("10")
+        self.mass_limit_value.setMaximumWidth(60)
+        limit_layout.addWidget(self.mass_limit_value)
+        self.mass_limit_unit = QComboBox()
+        self.mass_limit_unit.addItems(["% change", "absolute"])
+        limit_layout.addWidget(self.mass_limit_unit)
+        self.mass_limit_action = QComboBox()
+        self.mass_limit_action.addItems(["Reject", "Project"])
+        self.mass_limit_action.setToolTip("Reject: skip the solve. Project: scale the design back onto the mass limit")
+        limit_layout.addWidget(self.mass_limit_action)
+        limit_layout.addStretch()
+        target_layout.addLayout(limit_layout)
+        self.update_mass_limit_state()
         
         target_group.setLayout(target_layout)
         left_layout.addWidget(target_group)
@@ -739,9 +916,34 @@ class NastranOptimizerGUI(QMainWindow):
         right_layout.setContentsMargins(0, 0, 0, 0)
         right_layout.setSpacing(0)
         
-        # PyVista viewer (2/3 of space)
+        # PyVista viewer (2/3 of space), created when the first model is shown
+        self.plotter = None
+        self.viewer_layout = right_layout
+        self.viewer_placeholder = QLabel("3D Viewer: open a BDF file to display the model")
+        self.viewer_placeholder.setAlignment(Qt.AlignCenter)
+        self.viewer_placeholder.setStyleSheet("background-color: #0d2137; color: white;")
+        right_layout.addWidget(self.viewer_placeholder, stretch=2)
+        
+        # Matplotlib plots on bottom (1/3 of space), created with the first plot
+        self.canvas = None
+        plot_widget = QWidget()
+        plot_widget.setStyleSheet("background-color: #0a1929;")
+        self.plot_layout = QHBoxLayout(plot_widget)
+        self.plot_layout.setContentsMargins(0, 0, 0, 0)
+        self.plot_layout.setSpacing(0)
+        
+        right_layout.addWidget(plot_widget, stretch=1)
+        
+        return right_widget
+
+    def get_plotter(self):
+        """The PyVista viewer, created in place of its placeholder on first use; None if unavailable"""
+        if self.plotter is not None or self.viewer_placeholder is None:
+            return self.plotter
+        placeholder = self.viewer_placeholder
         try:
-            self.plotter = QtInteractor(right_widget)
+            from pyvistaqt import QtInteractor
+            self.plotter = QtInteractor(placeholder.parentWidget())
             self.plotter.add_axes(color="white", viewport=(0.9, 0.8, 1.1, 1.0), interactive=True)
             self.plotter.set_background('#0d2137')
             
@@ -750,23 +952,21 @@ class NastranOptimizerGUI(QMainWindow):
             self.plotter.interactor.setContentsMargins(0, 0, 0, 0)
             self.plotter.setStyleSheet("border: 0px; margin: 0px; padding: 0px;")
             self.plotter.interactor.setStyleSheet("border: 0px; margin: 0px; padding: 0px; background-color: #0d2137;")
-            right_layout.addWidget(self.plotter.interactor, stretch=2)
-
+            self.viewer_layout.replaceWidget(placeholder, self.plotter.interactor)
+            placeholder.deleteLater()
         except Exception as e:
-            placeholder = QLabel("3D Viewer (PyVista not available)")
-            placeholder.setAlignment(Qt.AlignCenter)
-            placeholder.setStyleSheet("background-color: #0d2137; color: white;")
-            right_layout.addWidget(placeholder, stretch=2)
-            print(f"PyVista initialization failed: {e}")
+            placeholder.setText("3D Viewer (PyVista not available)")
+            self.log(f"PyVista initialization failed: {e}")
             self.plotter = None
-        
-        # Matplotlib plots on bottom (1/3 of space)
-        plot_widget = QWidget()
-        plot_widget.setStyleSheet("background-color: #0a1929;")
-        plot_layout = QHBoxLayout(plot_widget)
-        plot_layout.setContentsMargins(0, 0, 0, 0)
-        plot_layout.setSpacing(0)
-        
+        self.viewer_placeholder = None
+        return self.plotter
+
+    def create_plots(self):
+        """Matplotlib progress plots, created for the first plot update"""
+        import matplotlib.pyplot as plt
+        from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg
+        from matplotlib.figure import Figure
+
         # Create matplotlib figure with aerospace blue theme
         plt.style.use('dark_background')
         self.fig = Figure(figsize=(12, 4), dpi=100, facecolor='#0d2137')
@@ -792,11 +992,15 @@ class NastranOptimizerGUI(QMainWindow):
         
         self.canvas = FigureCanvasQTAgg(self.fig)
         self.canvas.setStyleSheet("background-color: #0a1929;")
-        plot_layout.addWidget(self.canvas)
-        
-        right_layout.addWidget(plot_widget, stretch=1)
-        
-        return right_widget
+        self.plot_layout.addWidget(self.canvas)
+
+    def report_startup(self):
+        """Log the time from launch to the first idle event loop against STARTUP_BUDGET"""
+        elapsed = time.perf_counter() - STARTUP_T0
+        if elapsed > STARTUP_BUDGET:
+            self.log(f"Warning: startup took {elapsed:.2f} s, over the {STARTUP_BUDGET:.1f} s budget")
+        else:
+            self.log(f"Started in {elapsed:.2f} s")
     
     def refresh_visual(self):
         """Refresh the PyVista visualization with current BDF"""
@@ -818,6 +1022,11 @@ class NastranOptimizerGUI(QMainWindow):
             self.update_pyvista_mesh(filename)
             self.log("BDF file loaded and visualized")
         
+    def browse_warm_start(self):
+        filename, _ = QFileDialog.getOpenFileName(self, "Select Response Store", "", "Response stores (*.npz);;All files (*.*)")
+        if filename:
+            self.warm_start.setText(filename)
+
     def browse_nastran(self):
         filename, _ = QFileDialog.getOpenFileName(self, "Select Nastran Executable", "", "Executable files (*.exe);;All files (*.*)")
         if filename:
@@ -828,6 +1037,16 @@ class NastranOptimizerGUI(QMainWindow):
     
     def update_mass_state(self):
         self.mass_penalty_factor.setEnabled(self.use_mass_penalty.isChecked())
+
+    def update_mass_limit_state(self):
+        enabled = self.use_mass_limit.isChecked()
+        self.mass_limit_value.setEnabled(enabled)
+        self.mass_limit_unit.setEnabled(enabled)
+        self.mass_limit_action.setEnabled(enabled)
+
+    def update_cache_state(self):
+        self.cache_tolerance.setEnabled(self.use_cache.isChecked())
+        self.cache_size.setEnabled(self.use_cache.isChecked())
     
     def create_component_options(self):
         # Component options are already created, no need to recreate
@@ -849,156 +1068,171 @@ class NastranOptimizerGUI(QMainWindow):
             return "maximize"
         else:
             return "target"
-    
-    def parse_property_selection(self, prop_string, all_property_ids):
-        prop_string = prop_string.strip().lower()
-        if prop_string == "all":
-            return all_property_ids
-        selected_ids = []
-        parts = [p.strip() for p in prop_string.split(',')]
-        for part in parts:
-            if '-' in part:
-                try:
-                    start, end = part.split('-')
-                    start_id, end_id = int(start.strip()), int(end.strip())
-                    for pid in all_property_ids:
-                        if start_id <= pid <= end_id:
-                            selected_ids.append(pid)
-                except ValueError:
-                    raise ValueError(f"Invalid range format: {part}")
-            else:
-                try:
-                    pid = int(part)
-                    if pid in all_property_ids:
-                        selected_ids.append(pid)
-                    else:
-                        self.log(f"Warning: Property {pid} not found in model")
-                except ValueError:
-                    raise ValueError(f"Invalid property ID: {part}")
-        return list(set(selected_ids))
-    
-    def get_mass(self, bdf):
+
+    def get_target_value(self):
+        return float(self.target_value.text()) if self.get_optimize_mode() == 'target' else None
+
+    def study_config(self):
+        """Immutable study configuration from the input widgets; raises ValueError on bad input"""
+        return StudyConfig(
+            bdf_path=self.bdf_path.text(),
+            nastran_path=self.nastran_path.text(),
+            variables=self.variables.text(),
+            response_sets=self.response_sets.text(),
+            objective=self.objective_function.text(),
+            result_type=self.get_result_type(),
+            component=self.get_displacement_component(),
+            mode=self.get_optimize_mode(),
+            target=self.target_value.text(),
+            property_selection=self.property_selection.text(),
+            min_bound=self.min_bound.text(),
+            max_bound=self.max_bound.text(),
+            method=self.optimization_method.currentText(),
+            n_calls=self.n_calls.text(),
+            mass_penalty_factor=self.mass_penalty_factor.text() if self.use_mass_penalty.isChecked() else None,
+            mass_limit=self.mass_limit_value.text() if self.use_mass_limit.isChecked() else None,
+            mass_limit_unit=self.mass_limit_unit.currentText(),
+            mass_limit_action=self.mass_limit_action.currentText(),
+            max_solves=self.max_solves.text(),
+            solve_timeout=self.solve_timeout.text(),
+            solve_retries=self.solve_retries.text(),
+            retry_memory=self.retry_memory.text(),
+            job_root=self.job_root.text().strip() or JOB_ROOT,
+            scratch_dir=self.scratch_dir.text().strip(),
+            use_cache=self.use_cache.isChecked(),
+            cache_tolerance=self.cache_tolerance.text(),
+            cache_size=self.cache_size.text(),
+            incremental_decks=self.incremental_decks.isChecked(),
+            mass_check_every=self.mass_check_every.text(),
+            trim_output=self.trim_output.isChecked(),
+            excel_report=self.excel_report.isChecked(),
+            keep_best=self.keep_best.text(),
+            compress_kept=self.compress_kept.isChecked(),
+            warm_start=self.warm_start.text().strip()
+        )
+
+    def apply_config(self, config):
+        """Show a study configuration in the input widgets"""
+        for name in ("bdf_path", "nastran_path", "response_sets", "property_selection", "job_root",
+                     "scratch_dir", "warm_start"):
+            getattr(self, name).setText(getattr(config, name))
+        for name in ("min_bound", "max_bound", "n_calls", "max_solves", "solve_timeout", "solve_retries",
+                     "cache_tolerance", "cache_size", "mass_check_every", "keep_best"):
+            getattr(self, name).setText(str(getattr(config, name)))
+        for name in ("use_cache", "incremental_decks", "trim_output", "excel_report", "compress_kept"):
+            getattr(self, name).setChecked(getattr(config, name))
+        self.variables.setText(", ".join(map(str, config.variables)))
+        self.retry_memory.setText(", ".join(config.retry_memory))
+        self.objective_function.setText(config.objective)
+        self.target_value.setText(str(config.target))
+        self.optimization_method.setCurrentText(config.method)
+        # Radio buttons are exclusive: checking the configured one unchecks the others
+        (self.rb_displacement if config.result_type == "displacement" else self.rb_cbush).setChecked(True)
+        self.comp_buttons[config.component].setChecked(True)
+        {"minimize": self.rb_minimize, "maximize": self.rb_maximize, "target": self.rb_target}[config.mode].setChecked(True)
+        self.use_mass_penalty.setChecked(config.mass_penalty_factor is not None)
+        if config.mass_penalty_factor is not None:
+            self.mass_penalty_factor.setText(str(config.mass_penalty_factor))
+        self.use_mass_limit.setChecked(config.mass_limit is not None)
+        if config.mass_limit is not None:
+            self.mass_limit_value.setText(str(config.mass_limit))
+        self.mass_limit_unit.setCurrentText(config.mass_limit_unit)
+        self.mass_limit_action.setCurrentText(config.mass_limit_action)
+
+    def open_study(self):
+        """Load a study file (JSON, YAML or TOML) into the input widgets"""
+        path, _ = QFileDialog.getOpenFileName(self, "Open Study", "",
+                                              "Study files (*.json *.yaml *.yml *.toml);;All files (*.*)")
+        if not path:
+            return
         try:
-            mass, cg, I = mass_properties(bdf)
-            return mass
-        except Exception as e:
-            self.log(f"Warning: Could not calculate mass: {e}")
-            return None
-    
-    def get_displacement_value(self, node_id, df, component):
-        values = df.loc[df["NodeID"] == node_id, component]
-        if values.empty:
-            raise ValueError(f"Node {node_id} not found")
-        return values.iat[0]
-    
-    def get_cbush_force_value(self, element_id, df, component):
-        values = df.loc[df["ElementID"] == element_id, component]
-        if values.empty:
-            raise ValueError(f"Element {element_id} not found")
-        return values.iat[0]
-    
-    def calculate_tmag(self, node_id, df, component):
-        if component == "XYZ":
-            t1 = self.get_displacement_value(node_id, df, "t1")
-            t2 = self.get_displacement_value(node_id, df, "t2")
-            t3 = self.get_displacement_value(node_id, df, "t3")
-            return np.sqrt(t1**2 + t2**2 + t3**2)
-        elif component == "XY":
-            t1 = self.get_displacement_value(node_id, df, "t1")
-            t2 = self.get_displacement_value(node_id, df, "t2")
-            return np.sqrt(t1**2 + t2**2)
-        elif component == "XZ":
-            t1 = self.get_displacement_value(node_id, df, "t1")
-            t3 = self.get_displacement_value(node_id, df, "t3")
-            return np.sqrt(t1**2 + t3**2)
-        elif component == "YZ":
-            t2 = self.get_displacement_value(node_id, df, "t2")
-            t3 = self.get_displacement_value(node_id, df, "t3")
-            return np.sqrt(t2**2 + t3**2)
-        else:
-            comp_map = {"X": "t1", "Y": "t2", "Z": "t3"}
-            return self.get_displacement_value(node_id, df, comp_map.get(component, "t1"))
-    
-    def calculate_fmag(self, element_id, df, component):
-        if component == "XYZ":
-            fx = self.get_cbush_force_value(element_id, df, "fx")
-            fy = self.get_cbush_force_value(element_id, df, "fy")
-            fz = self.get_cbush_force_value(element_id, df, "fz")
-            return np.sqrt(fx**2 + fy**2 + fz**2)
-        elif component == "XY":
-            fx = self.get_cbush_force_value(element_id, df, "fx")
-            fy = self.get_cbush_force_value(element_id, df, "fy")
-            return np.sqrt(fx**2 + fy**2)
-        elif component == "XZ":
-            fx = self.get_cbush_force_value(element_id, df, "fx")
-            fz = self.get_cbush_force_value(element_id, df, "fz")
-            return np.sqrt(fx**2 + fz**2)
-        elif component == "YZ":
-            fy = self.get_cbush_force_value(element_id, df, "fy")
-            fz = self.get_cbush_force_value(element_id, df, "fz")
-            return np.sqrt(fy**2 + fz**2)
-        else:
-            comp_map = {"X": "fx", "Y": "fy", "Z": "fz"}
-            return self.get_cbush_force_value(element_id, df, comp_map.get(component, "fx"))
-    
-    def evaluate_objective_function(self, node_values, func_str):
-        namespace = {'abs': abs, 'sqrt': np.sqrt, 'np': np, 'sin': np.sin, 'cos': np.cos, 
-                    'tan': np.tan, 'exp': np.exp, 'log': np.log, '__builtins__': {}}
-        namespace.update(node_values)
+            self.apply_config(StudyConfig.from_file(path))
+        except (OSError, ValueError, TypeError) as e:
+            QMessageBox.critical(self, "Study Error", f"Cannot read study {path}: {e}")
+            return
+        self.log(f"Study loaded from {path}")
+
+    def save_study(self):
+        """Save the current settings as a study file for the command line runner"""
+        path, _ = QFileDialog.getSaveFileName(self, "Save Study", "study.yaml",
+                                              "Study files (*.yaml *.yml *.json)")
+        if not path:
+            return
         try:
-            result = eval(func_str, namespace)
-            return float(result)
-        except Exception as e:
-            raise ValueError(f"Error evaluating objective function: {e}")
-    
-    def apply_mass_penalty(self, result, current_mass, mode):
-        if not self.use_mass_penalty.isChecked() or self.initial_mass is None or current_mass is None:
-            return result
-        mass_change = (current_mass - self.initial_mass) / self.initial_mass
-        penalty_factor = float(self.mass_penalty_factor.text())
-        if mode == 'minimize':
-            penalized = result * (1.0 + penalty_factor * max(0, mass_change))
-        elif mode == 'maximize':
-            penalized = result / (1.0 + penalty_factor * max(0, mass_change))
-        elif mode == 'target':
-            penalized = result * (1.0 + penalty_factor * max(0, mass_change))
-        else:
-            penalized = result
-        return penalized
-    
-    def extract_results_from_op2(self, op2_name, variables, result_type):
-        """Extract variable values from OP2 file - unified function"""
+            self.study_config().save(path)
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "Study Error", str(e))
+            return
+        self.log(f"Study saved to {path}, run it with: python clone1600_engine.py run {path}")
+
+    def resume_study(self):
+        """Restore the settings of a checkpointed study and continue it without re-solving"""
+        if self.is_running:
+            QMessageBox.warning(self, "Warning", "Stop the running optimization first!")
+            return
+        root = QFileDialog.getExistingDirectory(self, "Select Study Checkpoint", latest_checkpoint())
+        if not root:
+            return
         try:
-            op2 = read_op2(op2_name, build_dataframe=True)
-            if self.load_case is None:
-                self.load_case = list(op2.displacements.keys())[0]
-            
-            if result_type == "displacement":
-                df = op2.displacements[self.load_case].dataframe
-                df.reset_index(inplace=True)
-            else:
-                df = op2.cbush_force[self.load_case].dataframe
-                df.reset_index(inplace=True)
-            
-            comp = self.get_displacement_component()
-            variable_values = {}
-            
-            for i, id_value in enumerate(variables, 1):
-                if result_type == "displacement":
-                    if comp in ["XYZ", "XY", "XZ", "YZ"]:
-                        value = self.calculate_tmag(id_value, df, comp)
-                    else:
-                        value = self.get_displacement_value(id_value, df, comp)
-                else:
-                    if comp in ["XYZ", "XY", "XZ", "YZ"]:
-                        value = self.calculate_fmag(id_value, df, comp)
-                    else:
-                        value = self.get_cbush_force_value(id_value, df, comp)
-                variable_values[f'w{i}'] = value
-            return variable_values
+            self.apply_config(StudyConfig.from_checkpoint(root))
+        except (OSError, ValueError, TypeError) as e:
+            QMessageBox.critical(self, "Resume Error", f"Cannot read checkpoint in {root}: {e}")
+            return
+        self.log(f"Resuming study from {root}")
+        self.resume_dir = root
+        try:
+            self.start_optimization()
+        finally:
+            self.resume_dir = None
+
+    def reevaluate_history(self):
+        """Re-score a stored run under the current objective, mode, target and mass penalty"""
+        if self.is_running:
+            QMessageBox.warning(self, "Warning", "Stop the running optimization first!")
+            return
+        path, _ = QFileDialog.getOpenFileName(self, "Select Response Store",
+                                              os.path.join(os.path.dirname(latest_checkpoint()), RESPONSE_FILE),
+                                              "Response stores (*.npz);;All files (*.*)")
+        if not path:
+            return
+        try:
+            study, iterations = ResponseStore(path).load()
+            if not iterations:
+                raise ValueError("The response store holds no solved iterations")
+            variables = study['variables']
+            response_sets = {name: None if ranges is None else [tuple(r) for r in ranges]
+                             for name, ranges in study['response_sets'].items()}
+            objective_expr = ObjectiveExpression(self.objective_function.text(),
+                                                 response_variable_names(variables, response_sets))
+            mode = self.get_optimize_mode()
+            target = self.get_target_value()
+            penalty_factor = float(self.mass_penalty_factor.text()) if self.use_mass_penalty.isChecked() else None
+            results, objectives = rescore_responses(iterations, variables, response_sets, study['component'],
+                                                    objective_expr, mode, target, study['initial_mass'],
+                                                    penalty_factor)
+            finite = np.flatnonzero(np.isfinite(objectives))
+            if finite.size == 0:
+                raise ValueError("No stored iteration has a finite objective under this objective function")
+            best = int(finite[np.argmin(objectives[finite])])
         except Exception as e:
-            self.log(f"Error extracting results from {op2_name}: {e}")
-            return None
+            QMessageBox.critical(self, "Re-evaluation Error", str(e))
+            return
+
+        best_it = iterations[best]
+        self.iteration_data = [{'iteration': it['iteration'], 'result': float(result), 'best_so_far': running,
+                                'mass': float(it['mass'])}
+                               for it, result, running in zip(iterations, results, best_so_far(results, mode, target))]
+        self.update_plots()
+        multipliers = ", ".join(f"{m:.4f}" for m in best_it['multipliers'])
+        self.log(f"Re-evaluated {len(iterations)} stored iterations of {path} with '{objective_expr.expression}' ({mode})")
+        self.log(f"Best: iteration {best_it['iteration']}, result {results[best]:.6f}, "
+                 f"mass {float(best_it['mass']):.2f}, multipliers [{multipliers}]")
+        QMessageBox.information(self, "Re-evaluation",
+                                f"Best design: iteration {best_it['iteration']}\n"
+                                f"Result: {results[best]:.6f}\n"
+                                f"Mass: {float(best_it['mass']):.2f}\n"
+                                f"Properties: {', '.join(map(str, study['property_ids']))}\n"
+                                f"Multipliers: {multipliers}")
     
     def log(self, message):
         self.log_text.append(f"{time.strftime('%H:%M:%S')} - {message}")
@@ -1007,7 +1241,7 @@ class NastranOptimizerGUI(QMainWindow):
     @Slot(str)
     def update_pyvista_mesh(self, bdf_path):   
         """Update PyVista visualization with current BDF mesh - OPTIMIZED"""
-        if self.plotter is None:
+        if self.get_plotter() is None:
             self.log("PyVista viewer not available")
             return
             
@@ -1026,122 +1260,82 @@ class NastranOptimizerGUI(QMainWindow):
             self.element_labels_action.setChecked(False)
         
         try:
-            bdf = read_bdf(bdf_path)
-
-            # Extract nodes and create mapping
-            nodes = []
-            node_ids = []
-            node_id_to_idx = {}
-            for nid, node in bdf.nodes.items():
-                node_id_to_idx[nid] = len(nodes)
-                nodes.append(node.get_position())
-                node_ids.append(nid)
+            import pyvista as pv
+            model = MODEL_CACHE.get(bdf_path)
+            points = model.coords
             
-            if not nodes:
+            if not len(points):
                 self.log("No nodes found in BDF")
                 return
             
-            points = np.array(nodes)
-            
             # Get selected variables (nodes or elements to monitor)
             variables_str = self.variables.text().strip()
             selected_variables = [int(x.strip()) for x in variables_str.split(',') if x.strip()] if variables_str else []
-            selected_variables_set = set(selected_variables)
             result_type = self.get_result_type()
             
             # Get selected properties
-            all_property_ids = list(bdf.properties.keys())
+            all_property_ids = model.property_ids.tolist()
             try:
-                selected_property_ids = self.parse_property_selection(
+                selected_property_ids, _ = select_properties(
                     self.property_selection.text(), all_property_ids
                 )
-                selected_property_ids_set = set(selected_property_ids)
                 all_properties_selected = (len(selected_property_ids) == len(all_property_ids))
             except:
-                selected_property_ids_set = set()
+                selected_property_ids = []
                 all_properties_selected = True
+            selected_elements = all_properties_selected | np.isin(model.element_pids, selected_property_ids)
             
             self.plotter.clear()
             
             # ==================== SHELL ELEMENTS (BATCH PROCESSING) ====================
+            # VTK cells [n, i1, ..., in] straight from the cached connectivity
             selected_shell_cells = []
             unselected_shell_cells = []
             
-            for eid, elem in bdf.elements.items():
-                if elem.type in ['CQUAD4', 'CQUAD8', 'CQUAD']:
-                    nids = elem.node_ids[:4]
-                    if all(nid in node_id_to_idx for nid in nids):
-                        indices = [node_id_to_idx[nid] for nid in nids]
-                        cell = [4] + indices
-                        
-                        elem_pid = elem.pid if hasattr(elem, 'pid') else None
-                        if all_properties_selected or elem_pid in selected_property_ids_set:
-                            selected_shell_cells.append(cell)
-                        else:
-                            unselected_shell_cells.append(cell)
-                            
-                elif elem.type in ['CTRIA3', 'CTRIA6', 'CTRIA']:
-                    nids = elem.node_ids[:3]
-                    if all(nid in node_id_to_idx for nid in nids):
-                        indices = [node_id_to_idx[nid] for nid in nids]
-                        cell = [3] + indices
-                        
-                        elem_pid = elem.pid if hasattr(elem, 'pid') else None
-                        if all_properties_selected or elem_pid in selected_property_ids_set:
-                            selected_shell_cells.append(cell)
-                        else:
-                            unselected_shell_cells.append(cell)
+            for shell_types, n in ((['CQUAD4', 'CQUAD8', 'CQUAD'], 4), (['CTRIA3', 'CTRIA6', 'CTRIA'], 3)):
+                mask = np.isin(model.element_types, shell_types)
+                corners = model.element_corners(mask, n)
+                complete = (corners >= 0).all(axis=1)
+                cells = np.hstack([np.full((len(corners), 1), n), corners])
+                selected_shell_cells.append(cells[complete & selected_elements[mask]])
+                unselected_shell_cells.append(cells[complete & ~selected_elements[mask]])
+            
+            n_selected = sum(len(cells) for cells in selected_shell_cells)
+            n_unselected = sum(len(cells) for cells in unselected_shell_cells)
             
             # Plot unselected shells (gray)
-            if unselected_shell_cells:
-                unsel_array = np.hstack(unselected_shell_cells)
+            if n_unselected:
+                unsel_array = np.concatenate([cells.ravel() for cells in unselected_shell_cells])
                 unsel_mesh = pv.PolyData(points, unsel_array)
                 self.plotter.add_mesh(unsel_mesh, color='gray', show_edges=True, opacity=0.3)
             
             # Plot selected shells (cyan)
-            if selected_shell_cells:
-                sel_array = np.hstack(selected_shell_cells)
+            if n_selected:
+                sel_array = np.concatenate([cells.ravel() for cells in selected_shell_cells])
                 sel_mesh = pv.PolyData(points, sel_array)
                 self.plotter.add_mesh(sel_mesh, color='cyan', show_edges=True, opacity=0.8)
-                self.log(f"Mesh: {len(nodes)} nodes, {len(selected_shell_cells)} selected shells, {len(unselected_shell_cells)} unselected shells")
+                self.log(f"Mesh: {len(points)} nodes, {n_selected} selected shells, {n_unselected} unselected shells")
             
             # ==================== CBUSH ELEMENTS (BATCH PROCESSING WITH LINES) ====================
-            cbush_points_selected = []
-            cbush_lines_selected = []
-            cbush_points_unselected = []
-            cbush_lines_unselected = []
-            
-            for eid, elem in bdf.elements.items():
-                if elem.type == 'CBUSH':
-                    try:
-                        nids = elem.node_ids[:2]
-                        if all(nid in node_id_to_idx for nid in nids):
-                            pos1 = bdf.nodes[nids[0]].get_position()
-                            pos2 = bdf.nodes[nids[1]].get_position()
-                            
-                            if result_type == 'cbush_force' and eid in selected_variables_set:
-                                idx = len(cbush_points_selected)
-                                cbush_points_selected.extend([pos1, pos2])
-                                cbush_lines_selected.append([2, idx, idx+1])
-                            else:
-                                idx = len(cbush_points_unselected)
-                                cbush_points_unselected.extend([pos1, pos2])
-                                cbush_lines_unselected.append([2, idx, idx+1])
-                    except (KeyError, IndexError, AttributeError):
-                        continue
+            cbush = model.element_types == 'CBUSH'
+            ends = model.element_corners(cbush, 2)
+            complete = (ends >= 0).all(axis=1)
+            if result_type == 'cbush_force':
+                highlighted = np.isin(model.element_ids[cbush], selected_variables)
+            else:
+                highlighted = np.zeros(len(ends), dtype=bool)
+            lines = np.hstack([np.full((len(ends), 1), 2), ends])
+            cbush_lines_selected = lines[complete & highlighted]
+            cbush_lines_unselected = lines[complete & ~highlighted]
             
             # Plot unselected CBUSH (yellow)
-            if cbush_lines_unselected:
-                cbush_unsel_points = np.array(cbush_points_unselected)
-                cbush_unsel_lines = np.hstack(cbush_lines_unselected)
-                cbush_unsel_mesh = pv.PolyData(cbush_unsel_points, lines=cbush_unsel_lines)
+            if len(cbush_lines_unselected):
+                cbush_unsel_mesh = pv.PolyData(points, lines=cbush_lines_unselected.ravel())
                 self.plotter.add_mesh(cbush_unsel_mesh, color='yellow', line_width=6)
             
             # Plot selected CBUSH (red)
-            if cbush_lines_selected:
-                cbush_sel_points = np.array(cbush_points_selected)
-                cbush_sel_lines = np.hstack(cbush_lines_selected)
-                cbush_sel_mesh = pv.PolyData(cbush_sel_points, lines=cbush_sel_lines)
+            if len(cbush_lines_selected):
+                cbush_sel_mesh = pv.PolyData(points, lines=cbush_lines_selected.ravel())
                 self.plotter.add_mesh(cbush_sel_mesh, color='red', line_width=12)
             
             cbush_total = len(cbush_lines_selected) + len(cbush_lines_unselected)
@@ -1149,40 +1343,21 @@ class NastranOptimizerGUI(QMainWindow):
                 self.log(f"CBUSH: {cbush_total} elements ({len(cbush_lines_selected)} highlighted)")
             
             # ==================== CBAR ELEMENTS (BATCH PROCESSING WITH LINES) ====================
-            cbar_points = []
-            cbar_lines = []
-            
-            for eid, elem in bdf.elements.items():
-                if elem.type == 'CBAR':
-                    try:
-                        nids = elem.node_ids[:2]
-                        if all(nid in node_id_to_idx for nid in nids):
-                            pos1 = bdf.nodes[nids[0]].get_position()
-                            pos2 = bdf.nodes[nids[1]].get_position()
-                            idx = len(cbar_points)
-                            cbar_points.extend([pos1, pos2])
-                            cbar_lines.append([2, idx, idx+1])
-                    except (KeyError, IndexError, AttributeError):
-                        continue
+            ends = model.element_corners(model.element_types == 'CBAR', 2)
+            cbar_lines = np.hstack([np.full((len(ends), 1), 2), ends])[(ends >= 0).all(axis=1)]
             
             # Plot all CBAR (green)
-            if cbar_lines:
-                cbar_points_array = np.array(cbar_points)
-                cbar_lines_array = np.hstack(cbar_lines)
-                cbar_mesh = pv.PolyData(cbar_points_array, lines=cbar_lines_array)
+            if len(cbar_lines):
+                cbar_mesh = pv.PolyData(points, lines=cbar_lines.ravel())
                 self.plotter.add_mesh(cbar_mesh, color='green', line_width=5)
                 self.log(f"CBAR: {len(cbar_lines)} elements")
             
             # ==================== HIGHLIGHTED NODES (for displacement monitoring) ====================
             if result_type == 'displacement' and selected_variables:
-                monitored_points = []
-                for nid in selected_variables:
-                    if nid in node_id_to_idx:
-                        idx = node_id_to_idx[nid]
-                        monitored_points.append(points[idx])
+                rows = model.node_index(selected_variables)
+                monitored_points = points[rows[rows >= 0]]
                 
-                if monitored_points:
-                    monitored_points = np.array(monitored_points)
+                if len(monitored_points):
                     x_range = np.ptp(points[:, 0])
                     y_range = np.ptp(points[:, 1])
                     z_range = np.ptp(points[:, 2])
@@ -1206,9 +1381,11 @@ class NastranOptimizerGUI(QMainWindow):
     def update_plots(self):
         if not self.iteration_data:
             return
+        if self.canvas is None:
+            self.create_plots()
         iterations = [d['iteration'] for d in self.iteration_data]
         results = [d['result'] for d in self.iteration_data]
-        best_results = [d['best_so_far'] for d in self.iteration_data]
+        best_results = best_so_far(results, self.get_optimize_mode(), self.get_target_value())
         
         self.ax1.clear()
         self.ax1.plot(iterations, results, color='#42a5f5', marker='o', label='Current Result', markersize=4, linewidth=2)
@@ -1246,6 +1423,13 @@ class NastranOptimizerGUI(QMainWindow):
         if not os.path.exists(self.nastran_path.text()):
             QMessageBox.critical(self, "Error", "Nastran executable not found!")
             return
+
+        # Bad settings and expressions are caught before the first (expensive) solve
+        try:
+            config = self.study_config()
+        except ValueError as e:
+            QMessageBox.critical(self, "Study Settings Error", str(e))
+            return
     
         self.is_running = True
         self.start_btn.setEnabled(False)
@@ -1254,7 +1438,7 @@ class NastranOptimizerGUI(QMainWindow):
         self.status_label.setStyleSheet("color: orange; font-weight: bold;")
         self.iteration_data = []
         self.initial_mass = None
-        self.load_case = None
+        self.best_bdf_name = None
 
         # Load initial mesh in PyVista
         self.update_pyvista_mesh(self.bdf_path.text())
@@ -1271,34 +1455,41 @@ class NastranOptimizerGUI(QMainWindow):
             )
             
         # Start optimization in separate thread
-        self.opt_thread = OptimizationThread(self)
+        self.opt_thread = OptimizationThread(config, self.resume_dir)
         self.opt_thread.progress_signal.connect(self.update_progress)
         self.opt_thread.finished_signal.connect(self.optimization_finished)
         self.opt_thread.log_signal.connect(self.log)
-        self.opt_thread.mass_signal.connect(self.mass_label.setText)
+        self.opt_thread.mass_signal.connect(self.set_initial_mass)
         self.opt_thread.mesh_update_signal.connect(self.update_pyvista_mesh)  # ADD THIS
         self.opt_thread.start()
     
     def stop_optimization(self):
-        self.is_running = False
-        self.log("Optimization stopped by user")
-        self.status_label.setText("Stopped")
+        # The engine keeps the shared model edited until its running solves have finished:
+        # Start stays disabled until optimization_finished
+        self.opt_thread.stop()
+        self.log("Stop requested, waiting for the running Nastran jobs to finish")
+        self.status_label.setText("Stopping...")
         self.status_label.setStyleSheet("color: red; font-weight: bold;")
-        self.start_btn.setEnabled(True)
         self.stop_btn.setEnabled(False)
         
 
-    def update_progress(self, iteration, result, best_result, current_mass, is_new_best):
-        progress_pct = (iteration / int(self.n_calls.text())) * 100
-        self.progress.setValue(int(progress_pct))
+    def set_initial_mass(self, initial_mass):
+        self.initial_mass = initial_mass
+        self.mass_label.setText(f"{initial_mass:.2f} (Initial)")
+
+    def update_progress(self, completed, iteration, result, best_result, current_mass, is_new_best):
+        # Results can arrive out of order when several solves run at once:
+        # progress follows the number of finished jobs, plots follow iteration order
+        progress_pct = (completed / int(self.n_calls.text())) * 100
+        self.progress.setValue(min(100, int(progress_pct)))
         self.best_result_label.setText(f"{best_result:.5f}")
-        
-        self.iteration_data.append({
+
+        bisect.insort(self.iteration_data, {
         'iteration': iteration,
         'result': result,
         'best_so_far': best_result,
         'mass': current_mass
-        })
+        }, key=lambda d: d['iteration'])
 
         if current_mass is not None and self.initial_mass:
             mass_change_pct = ((current_mass - self.initial_mass) / self.initial_mass * 100)
@@ -1306,7 +1497,7 @@ class NastranOptimizerGUI(QMainWindow):
         
         marker = " ★" if is_new_best else ""
         mass_info = f" | Mass: {current_mass:.5f}" if current_mass is not None else ""
-        self.log(f"[{iteration}/{self.n_calls.text()}] Result: {result:.5f} | Best: {best_result:.5f}{mass_info}{marker}")
+        self.log(f"[{completed}/{self.n_calls.text()}] Iter {iteration} | Result: {result:.5f} | Best: {best_result:.5f}{mass_info}{marker}")
 
         self.update_plots()
         QApplication.processEvents()
@@ -1353,6 +1544,10 @@ class NastranOptimizerGUI(QMainWindow):
             """)
             finish_dialog.exec()
 
+        elif self.opt_thread.engine.stopped.is_set():
+            self.log("Optimization stopped by user")
+            self.status_label.setText("Stopped")
+            self.status_label.setStyleSheet("color: red; font-weight: bold;")
         else:
             self.log(f"ERROR: {message}")
             self.status_label.setText("Error")
@@ -1365,332 +1560,36 @@ class NastranOptimizerGUI(QMainWindow):
             self.plotter.remove_actor(self.overlay_actor)
             self.overlay_actor = None
 
+        self.best_bdf_name = self.opt_thread.engine.best_bdf_name
         self.start_btn.setEnabled(True)
         self.stop_btn.setEnabled(False)
         self.is_running = False
-        
-        
-    def save_results(self, property_ids, original_values, best_multipliers, history, best_result, best_mass):
-        results_data = []
-        for i, pid in enumerate(property_ids):
-            if original_values[pid] is None:
-                continue
-            attr_name, original = original_values[pid]
-            multiplier = best_multipliers[i]
-            results_data.append({
-                'PID': pid, 
-                'Property_Type': attr_name, 
-                'Multiplier': multiplier, 
-                'Original_Value': original, 
-                'New_Value': original * multiplier
-            })
-        
-        df_results = pd.DataFrame(results_data)
-        df_history = pd.DataFrame(history)
-        
-        summary_data = {
-            'Parameter': [
-                'Best Result Value', 'Best BDF File', 'Optimization Mode', 'Target Value', 
-                'Total Iterations', 'Result Type', 'Component', 'Load Case', 
-                'Objective Function', 'Properties Optimized', 'Property Selection', 
-                'Mass Penalty Enabled', 'Mass Penalty Factor', 'Initial Mass', 
-                'Best Solution Mass', 'Mass Change (%)'
-            ],
-            'Value': [
-                f"{best_result:.6f}", 
-                self.best_bdf_name if self.best_bdf_name else "N/A", 
-                self.get_optimize_mode(), 
-                f"{self.target_value.text()}" if self.get_optimize_mode() == 'target' else "N/A", 
-                len(history), 
-                self.get_result_type(), 
-                self.get_displacement_component().upper(), 
-                self.load_case, 
-                self.objective_function.text(), 
-                len(property_ids), 
-                self.property_selection.text(), 
-                "Yes" if self.use_mass_penalty.isChecked() else "No", 
-                f"{self.mass_penalty_factor.text()}" if self.use_mass_penalty.isChecked() else "N/A", 
-                f"{self.initial_mass:.2f}" if self.initial_mass else "N/A", 
-                f"{best_mass:.2f}" if best_mass else "N/A", 
-                f"{((best_mass - self.initial_mass) / self.initial_mass * 100):+.2f}%" if (self.initial_mass and best_mass) else "N/A"
-            ]
-        }
-        df_summary = pd.DataFrame(summary_data)
-        
-        with pd.ExcelWriter("RESULTS.xlsx", engine='openpyxl') as writer:
-            df_summary.to_excel(writer, sheet_name='Summary', index=False)
-            df_results.to_excel(writer, sheet_name='Best_Solution', index=False)
-            df_history.to_excel(writer, sheet_name='History', index=False)
-        self.log("Results saved to RESULTS.xlsx")
 
 
 class OptimizationThread(QThread):
-    progress_signal = Signal(int, float, float, object, bool)
+    """Runs an OptimizationEngine off the GUI thread and forwards its callbacks as signals"""
+    progress_signal = Signal(int, int, float, float, object, bool)
     finished_signal = Signal(bool, str)
-    log_signal = Signal(str)  # ADD THIS LINE
-    mass_signal = Signal(str)  # ADD THIS
+    log_signal = Signal(str)
+    mass_signal = Signal(float)
     mesh_update_signal = Signal(str)
 
-    def __init__(self, gui):
+    def __init__(self, config, resume_dir=None):
         super().__init__()
-        self.gui = gui
-    
-    def wait_for_nastran(self):
-        while True:
-            running = [p for p in psutil.process_iter(["name"]) if p.info["name"] == "nastran.exe"]
-            if not running:
-                break
-            time.sleep(0.5)
+        self.engine = OptimizationEngine(config, log=self.log_signal.emit, progress=self.progress_signal.emit,
+                                         mass=self.mass_signal.emit, resume_dir=resume_dir)
+
+    def stop(self):
+        self.engine.stop()
 
     def run(self):
         try:
-            iteration_data_local = []  # Local copy
-            path = self.gui.bdf_path.text()
-            variables_str = self.gui.variables.text().strip()
-            variables = [int(x.strip()) for x in variables_str.split(',') if x.strip()] if variables_str else []
-            
-            if len(variables) == 0:
-                self.finished_signal.emit(False, "Must specify at least one variable")
-                return  # Add early return
-                
-            result_type = self.gui.get_result_type()
-            self.log_signal.emit(f"Loading BDF file: {path}")
-            bdf = read_bdf(path)
-            
-            initial_mass = self.gui.get_mass(bdf)
-            self.gui.initial_mass = initial_mass  # Store in GUI (reading is OK)
-            if initial_mass is not None:
-                self.log_signal.emit(f"Initial mass: {initial_mass:.2f}")
-                self.mass_signal.emit(f"{initial_mass:.2f} (Initial)")  # USE SIGNAL!
-            
-            all_property_ids = list(bdf.properties.keys())
-            self.log_signal.emit(f"Total properties in model: {len(all_property_ids)}")
-            
-            selected_property_ids = self.gui.parse_property_selection(
-                self.gui.property_selection.text(), all_property_ids
-            )
-            self.log_signal.emit(f"Selected {len(selected_property_ids)} properties for optimization")
-            
-            original_values = {}
-            property_ids = []
-            for pid in selected_property_ids:
-                if pid not in bdf.properties:
-                    continue
-                prop = bdf.properties[pid]
-                property_ids.append(pid)
-                if prop.type == "PSHELL":
-                    original_values[pid] = ('PSHELL', prop.t)
-                elif prop.type == "PCOMP":
-                    original_values[pid] = ('PCOMP', prop.thicknesses[0])
-                elif prop.type == "PBARL":
-                    original_values[pid] = ('PBARL', prop.dim[0])
-                else:
-                    original_values[pid] = None
-                    self.log_signal.emit(f"Warning: Property {pid} type {prop.type} is not supported")
-            
-            if not property_ids:
-                raise ValueError("No valid properties selected for optimization")
-            
-            self.log_signal.emit(f"Optimizing {len(property_ids)} properties")
-            self.log_signal.emit(f"Result type: {result_type.upper()}, Component: {self.gui.get_displacement_component().upper()}")
-            
-            iteration = [0]
-            mode = self.gui.get_optimize_mode()
-            best_result = [float('inf') if mode == 'minimize' else float('-inf')]
-            best_multipliers = [None]
-            best_mass = [None]
-            history = []
-            
-            self.log_signal.emit("=" * 50)
-            self.log_signal.emit("Starting optimization...")
-            self.log_signal.emit("=" * 50)
-            
-            def objective_function(multipliers):
-                if not self.gui.is_running:
-                    raise StopIteration("Optimization stopped by user")
-                
-                iteration[0] += 1  # Always increment
-                current_iter = iteration[0]
-                
-                try:
-                    for i, pid in enumerate(property_ids):
-                        if original_values[pid] is None:
-                            continue
-                        prop = bdf.properties[pid]
-                        attr_name, original_value = original_values[pid]
-                        if attr_name == 'PSHELL':
-                            prop.t = original_value * multipliers[i]
-                        elif attr_name == 'PCOMP':
-                            prop.thicknesses[0] = original_value * multipliers[i]
-                        elif attr_name == 'PBARL':
-                            prop.dim[0] = original_value * multipliers[i]
-                    
-                    current_mass = self.gui.get_mass(bdf)
-                    
-                    if current_iter == 0:
-                        bdf_name_new = "opt_initial.bdf"
-                    else:
-                        bdf_name_new = f"opt_{current_iter}.bdf"
-                    
-                    bdf.write_bdf(bdf_name_new)
-                    
-                    subprocess.call([self.gui.nastran_path.text(), bdf_name_new, "scr=yes"],
-                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                    self.wait_for_nastran()  # Use thread's own method
-                    
-                    op2_name = bdf_name_new.replace(".bdf", ".op2")
-                    variable_values = self.gui.extract_results_from_op2(op2_name, variables, result_type)
-                    
-                    if variable_values is None:
-                        self.log_signal.emit(f"Failed to extract results in iteration {current_iter}")
-                        return 1e10
-                    
-                    result = self.gui.evaluate_objective_function(
-                        variable_values, self.gui.objective_function.text()
-                    )
-                    
-                    if mode == 'minimize':
-                        objective = result
-                    elif mode == 'maximize':
-                        objective = -result
-                    elif mode == 'target':
-                        objective = abs(result - float(self.gui.target_value.text()))
-                    
-                    objective = self.gui.apply_mass_penalty(objective, current_mass, mode)
-                    
-                    is_new_best = False
-                    if mode == 'minimize' and result < best_result[0]:
-                        best_result[0] = result
-                        best_multipliers[0] = list(multipliers)
-                        best_mass[0] = current_mass
-                        self.gui.best_bdf_name = bdf_name_new
-                        is_new_best = True
-                  
-                    elif mode == 'maximize' and result > best_result[0]:
-                        best_result[0] = result
-                        best_multipliers[0] = list(multipliers)
-                        best_mass[0] = current_mass
-                        self.gui.best_bdf_name = bdf_name_new
-                        is_new_best = True
-                     
-                    elif mode == 'target' and abs(result - float(self.gui.target_value.text())) < abs(best_result[0] - float(self.gui.target_value.text())):
-                        best_result[0] = result
-                        best_multipliers[0] = list(multipliers)
-                        best_mass[0] = current_mass
-                        self.gui.best_bdf_name = bdf_name_new
-                        is_new_best = True
-                  
-                    history.append({
-                        'Iteration': current_iter, 
-                        'Result': result, 
-                        'Mass': current_mass if current_mass else 'N/A', 
-                        **variable_values, 
-                        'Multipliers': list(multipliers)
-                    })
-
-                    new_data = {
-                    'iteration': current_iter, 
-                    'result': result, 
-                    'best_so_far': best_result[0], 
-                    'mass': current_mass
-                    }
-
-                    iteration_data_local.append(new_data)
-
-                                    
-                    self.progress_signal.emit(current_iter, result, best_result[0], current_mass, is_new_best)
-                    
-                    if not is_new_best:
-                        try:
-                            for ext in [".f04", ".f06", ".log", ".op2", ".bdf"]:
-                                os.remove(bdf_name_new.replace(".bdf", ext) if ext != ".bdf" else bdf_name_new)
-                        except:
-                            pass
-                    
-                    return objective
-                except Exception as e:
-                    self.log_signal.emit(f"ERROR in iteration {current_iter}: {e}")
-                    return 1e10
-            
-            bounds = [(float(self.gui.min_bound.text()), float(self.gui.max_bound.text()))] * len(property_ids)
-            method = self.gui.optimization_method.currentText()
-            n_calls_val = int(self.gui.n_calls.text())
-            
-            self.log_signal.emit(f"Using optimization method: {method}")
-            self.log_signal.emit(f"Target iterations: {n_calls_val}")
-            
-            if method == "Gaussian Process":
-                n_initial = min(5, max(3, n_calls_val // 3))
-                self.log_signal.emit(f"GP Minimize: n_calls={n_calls_val}, n_initial={n_initial}")
-                result = gp_minimize(
-                    objective_function,
-                    bounds,
-                    n_calls=n_calls_val,
-                    n_initial_points=n_initial,
-                    random_state=42,
-                    verbose=False,
-                    n_jobs=1
-                )
-                
-            elif method == "Boosted Trees":
-                n_initial = min(5, max(3, n_calls_val // 3))
-                self.log_signal.emit(f"GBRT Minimize: n_calls={n_calls_val}, n_initial={n_initial}")
-                result = gbrt_minimize(
-                    objective_function,
-                    bounds,
-                    n_calls=n_calls_val,
-                    n_initial_points=n_initial,
-                    random_state=42,
-                    verbose=False,
-                    n_jobs=1
-                )
-                
-            elif method == "Differential Evo":
-                # Calculate DE parameters
-                n_params = len(property_ids)
-                popsize = 5 if n_params > 50 else 15
-                
-                # DE does popsize * maxiter * n_params evaluations
-                maxiter = max(2, min(1000, n_calls_val // (popsize * n_params)))
-                estimated_calls = popsize * maxiter * n_params
-                
-                self.log_signal.emit(f"Differential Evolution: popsize={popsize}, maxiter={maxiter}")
-                self.log_signal.emit(f"Estimated function calls: {estimated_calls} (target: {n_calls_val})")
-                
-                def de_callback(xk, convergence):
-                    if not self.gui.is_running:
-                        self.log_signal.emit("Stopping: optimization halted by user")
-                        return True
-                    if iteration[0] >= n_calls_val:
-                        self.log_signal.emit(f"Stopping: reached target of {n_calls_val} evaluations")
-                        return True
-                    return False
-                
-                result = differential_evolution(
-                    objective_function,
-                    bounds,
-                    maxiter=maxiter,
-                    popsize=popsize,
-                    seed=42,
-                    polish=False,
-                    workers=1,
-                    callback=de_callback,
-                    atol=0.001,
-                    tol=0.01
-                )
-            else:
-                raise ValueError(f"Unknown optimization method: {method}")
-            
+            self.engine.run()
             """
-            if best_multipliers[0] is not None and self.gui.best_bdf_name:
-                self.mesh_update_signal.emit(self.gui.best_bdf_name)
+            if self.engine.best_bdf_name:
+                self.mesh_update_signal.emit(self.engine.best_bdf_name)
             """
-
-            self.gui.iteration_data = iteration_data_local
-            self.gui.save_results(property_ids, original_values, best_multipliers[0], 
-                                history, best_result[0], best_mass[0])
             self.finished_signal.emit(True, "Optimization completed successfully")
-            
         except StopIteration:
             self.finished_signal.emit(False, "Optimization stopped by user")
         except Exception as e:
@@ -1703,6 +1602,7 @@ def main():
     window = NastranOptimizerGUI()
     window.showMaximized()
     window.show()
+    QTimer.singleShot(0, window.report_startup)
     app.exec()
 
 if __name__ == "__main__":
@@ -0,0 +1,2326 @@
+"""CLONE1600 optimization engine: runs Nastran property optimization studies without the GUI
+
+Usage: python clone1600_engine.py run study.yaml
+       python clone1600_engine.py resume [opt_checkpoint]
+"""
+# pyNastran, pandas, skopt and scipy take seconds to import, so they are imported
+# where first needed rather than here
+import os, sys, re, io, ast, subprocess, psutil, shutil, sqlite3, hashlib, json, zipfile, copy
+import time, bisect, queue, threading, argparse
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, fields
+
+JOB_ROOT = "opt_jobs"
+FAILED_OBJECTIVE = 1e10
+INITIAL_POINT_GENERATOR = "lhs"  # "lhs" or "sobol"
+CACHE_FILE = "clone1600_cache.sqlite"
+MASTER_DECK = "opt_master.bdf"
+RUN_ROOT = "opt_runs"  # one timestamped directory per study, holding the three entries below
+RESPONSE_FILE = "opt_responses.npz"
+KEEP_ROOT = "opt_best"
+CHECKPOINT_DIR = "opt_checkpoint"
+RESULTS_FILE = "RESULTS.xlsx"  # summary workbook, also written to the run directory
+REPORT_BEST_ROWS = 10  # designs listed on the Best_Designs sheet
+SNAPSHOT_SUFFIX = ".snapshot.npz"  # model snapshot written next to each BDF
+RANDOM_SEED = 42
+
+# Job completion tracking
+JOB_POLL_MIN = 0.05  # seconds, grows up to JOB_POLL_MAX
+JOB_POLL_MAX = 0.5
+DETACHED_JOB_IDLE = 3600.0  # seconds without output before an untimed detached job is given up
+NASTRAN_END_MARKERS = {
+    ".log": re.compile(r"Nastran\s+finished", re.IGNORECASE),
+    ".f06": re.compile(r"\*\s*\*\s*\*\s*END OF JOB\s*\*\s*\*\s*\*"),
+}
+NASTRAN_FATAL_MARKER = re.compile(r"FATAL\s+(MESSAGE|ERROR)")
+NASTRAN_OUTPUTS = (".f04", ".f06", ".log", ".op2")
+
+# OP2 result tables read for each result type and their data columns
+RESULT_TABLES = {"displacement": "displacements", "cbush_force": "force.cbush_force"}
+RESULT_COLUMNS = {
+    "displacement": ("t1", "t2", "t3", "r1", "r2", "r3"),
+    "cbush_force": ("fx", "fy", "fz", "mx", "my", "mz"),
+}
+
+AGGREGATES = ("max", "min", "mean", "rms", "sum", "argmax")
+
+# Case control output requests dropped when the per-iteration output is trimmed
+OUTPUT_REQUESTS = ("DISPLACEMENT", "DISP", "VELOCITY", "VELO", "ACCELERATION", "ACCE", "FORCE", "ELFORCE",
+                   "STRESS", "ELSTRESS", "STRAIN", "ELSTRAIN", "SPCFORCES", "SPCF", "MPCFORCES", "MPCF",
+                   "OLOAD", "GPFORCE", "GPSTRESS", "ESE", "EKE", "EDE")
+# Output request that carries each result type
+RESULT_REQUESTS = {"displacement": "DISPLACEMENT", "cbush_force": "FORCE"}
+
+# Data columns combined for each displacement/force component
+COMPONENT_AXES = {"X": (0,), "Y": (1,), "Z": (2,), "XY": (0, 1), "XZ": (0, 2), "YZ": (1, 2), "XYZ": (0, 1, 2)}
+
+# Evaluation status codes recorded in the history
+STATUS_OK = "ok"
+STATUS_CACHED = "cached"
+STATUS_MASS_REJECTED = "mass_rejected"
+STATUS_TIMEOUT = "timeout"
+STATUS_FATAL = "nastran_fatal"
+STATUS_NO_RESULTS = "no_results"
+STATUS_ERROR = "error"
+STATUSES = (STATUS_OK, STATUS_CACHED, STATUS_MASS_REJECTED, STATUS_TIMEOUT, STATUS_FATAL,
+            STATUS_NO_RESULTS, STATUS_ERROR)
+
+
+def is_better(result, best, mode, target=None):
+    """Return True if result improves on best for the given optimization mode"""
+    if best is None:
+        return True
+    if mode == 'minimize':
+        return result < best
+    elif mode == 'maximize':
+        return result > best
+    return abs(result - target) < abs(best - target)
+
+
+def score_results(results, mode, target=None):
+    """Objective to minimize for raw results (scalar or array) in the given optimization mode"""
+    if mode == 'minimize':
+        return results
+    elif mode == 'maximize':
+        return -results
+    return np.abs(results - target)
+
+
+def read_tail(path, nbytes=65536):
+    """Last nbytes of a text file, or an empty string if it does not exist yet"""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - nbytes))
+            return f.read().decode('latin-1')
+    except OSError:
+        return ""
+
+
+def clear_nastran_outputs(bdf_path):
+    """Remove the solver output of a previous attempt so a retry starts clean"""
+    stem = os.path.splitext(bdf_path)[0]
+    for ext in NASTRAN_OUTPUTS:
+        if os.path.exists(stem + ext):
+            os.remove(stem + ext)
+
+
+def file_sha256(path):
+    """SHA-256 of a file's contents, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def deck_sha256(bdf, path):
+    """SHA-256 of a deck and every file it INCLUDEs; equal to file_sha256(path) without INCLUDEs"""
+    names = [os.path.abspath(name) for name in bdf.active_filenames] or [os.path.abspath(path)]
+    if len(names) == 1:
+        return file_sha256(names[0])
+    digest = hashlib.sha256()
+    for name in names:
+        digest.update(file_sha256(name).encode())
+    return digest.hexdigest()
+
+
+def apply_multiplier(prop, original, multiplier):
+    """Scale the optimized dimension of a property: PSHELL t, PCOMP first ply, PBARL dim[0]"""
+    attr_name, original_value = original
+    if attr_name == 'PSHELL':
+        prop.t = original_value * multiplier
+    elif attr_name == 'PCOMP':
+        prop.thicknesses[0] = original_value * multiplier
+    elif attr_name == 'PBARL':
+        prop.dim[0] = original_value * multiplier
+
+
+def response_magnitudes(data, component):
+    """Signed value for X/Y/Z, vector magnitude for XY/XZ/YZ/XYZ, over rows of data (..., n, 6)"""
+    axes = COMPONENT_AXES[component]
+    if len(axes) == 1:
+        return data[..., axes[0]]
+    return np.sqrt(np.sum(data[..., list(axes)] ** 2, axis=-1))
+
+
+def parse_id_ranges(id_string):
+    """Parse "all" or a comma list of IDs and start-end ranges into [(start, end), ...]; None means all"""
+    id_string = id_string.strip().lower()
+    if id_string == "all":
+        return None
+    ranges = []
+    for part in [p.strip() for p in id_string.split(',')]:
+        if not part:
+            continue
+        if '-' in part:
+            try:
+                start, end = part.split('-')
+                ranges.append((int(start.strip()), int(end.strip())))
+            except ValueError:
+                raise ValueError(f"Invalid range format: {part}")
+        else:
+            try:
+                ranges.append((int(part), int(part)))
+            except ValueError:
+                raise ValueError(f"Invalid ID: {part}")
+    return ranges
+
+
+def parse_response_sets(sets_string):
+    """Parse named ID sets, e.g. "top: 10000-250000; bolts: 501, 502-510", into {name: ranges}"""
+    sets = {}
+    for entry in [e.strip() for e in sets_string.split(';')]:
+        if not entry:
+            continue
+        if ':' not in entry:
+            raise ValueError(f"Invalid set definition (expected name: ids): {entry}")
+        name, id_string = [x.strip() for x in entry.split(':', 1)]
+        if not name.isidentifier():
+            raise ValueError(f"Invalid set name: {name}")
+        sets[name] = parse_id_ranges(id_string)
+    return sets
+
+
+def ids_in_ranges(ids, ranges):
+    """Boolean mask of the ids that fall in any of the ranges (None = all)"""
+    if ranges is None:
+        return np.ones(len(ids), dtype=bool)
+    singles = [start for start, end in ranges if start == end]
+    mask = np.isin(ids, singles)
+    for start, end in ranges:
+        if start != end:
+            mask |= (ids >= start) & (ids <= end)
+    return mask
+
+
+def response_variable_names(variables, response_sets):
+    """Names available to the objective function: w1..wN plus the aggregates of each set"""
+    names = [f'w{i}' for i in range(1, len(variables) + 1)]
+    for name in response_sets:
+        names.extend(f'{aggregate}_{name}' for aggregate in AGGREGATES)
+    return names
+
+
+def trim_output_requests(case_control, result_type, ids):
+    """Replace all output requests with a PLOT-only request for the given IDs (None = ALL)
+
+    The IDs go into a new SET of the global subcase and F06 echo is switched off, so each
+    solve only writes the table the objective reads. Returns the SET ID used, or None for ALL.
+    """
+    set_id = None
+    for subcase in case_control.subcases.values():
+        for key in [key for key in subcase.params if key in OUTPUT_REQUESTS]:
+            del subcase.params[key]
+
+    global_subcase = case_control.subcases[0]
+    if ids is not None:
+        used = [int(key.split()[1]) for subcase in case_control.subcases.values()
+                for key in subcase.params if key.startswith("SET ")]
+        set_id = max(used, default=0) + 1
+        global_subcase.add_set_from_values(set_id, sorted(int(i) for i in ids))
+    global_subcase.add(RESULT_REQUESTS[result_type], "ALL" if set_id is None else set_id, ["PLOT"], "STRESS-type")
+    global_subcase.add("ECHO", "NONE", [], "STRESS-type")
+    return set_id
+
+
+def response_variables(ids, data, variables, response_sets, component, index):
+    """Objective variables (w1..wN and set aggregates) from result rows data (..., n, 6) with IDs ids
+
+    data may carry a leading batch axis, e.g. the stored responses of many iterations, in which
+    case every variable is an array over that axis.
+    """
+    rows = index.rows(ids, variables)
+    values = response_magnitudes(data[..., rows, :], component)
+    variable_values = {f'w{i}': values[..., i - 1] for i in range(1, len(variables) + 1)}
+    for name, ranges in response_sets.items():
+        set_rows = index.set_rows(ids, name, ranges)
+        variable_values.update(aggregate_responses(name, ids[set_rows],
+                                                   response_magnitudes(data[..., set_rows, :], component)))
+    return variable_values
+
+
+def aggregate_responses(name, ids, values):
+    """Aggregate variables of a response set, reduced over the last axis of values (..., n)"""
+    return {
+        f'max_{name}': np.max(values, axis=-1),
+        f'min_{name}': np.min(values, axis=-1),
+        f'mean_{name}': np.mean(values, axis=-1),
+        f'rms_{name}': np.sqrt(np.mean(values ** 2, axis=-1)),
+        f'sum_{name}': np.sum(values, axis=-1),
+        f'argmax_{name}': ids[np.argmax(values, axis=-1)],
+    }
+
+
+def best_so_far(results, mode, target=None):
+    """Running best of results, in the order given"""
+    best = None
+    running = []
+    for result in results:
+        if is_better(result, best, mode, target):
+            best = result
+        running.append(best)
+    return running
+
+
+class NastranJob:
+    """One launched Nastran run, tracked through its own process tree and output files"""
+
+    def __init__(self, nastran_path, bdf_path, args=("scr=yes",)):
+        self.bdf_path = bdf_path
+        self.job_dir = os.path.dirname(bdf_path)
+        self.stem = os.path.splitext(bdf_path)[0]
+        self.returncode = None
+        self.fatal = False
+        self.timed_out = False
+        self.unfinished = False
+        self.started_at = time.time()
+        self.process = subprocess.Popen([nastran_path, os.path.basename(bdf_path), *args],
+                                        cwd=self.job_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.exited_at = None
+        self.tracked = {}
+        try:
+            self.launcher = psutil.Process(self.process.pid)
+        except psutil.Error:
+            self.launcher = None
+
+    def output_file(self, ext):
+        return self.stem + ext
+
+    def _track_children(self, proc):
+        # Remember every descendant while its parent is still alive, so the solver
+        # can still be followed after the launcher has returned
+        try:
+            for child in proc.children(recursive=True):
+                self.tracked.setdefault(child.pid, child)
+        except psutil.Error:
+            pass
+
+    def _tree_alive(self):
+        if self.process.poll() is None:
+            if self.launcher is not None:
+                self._track_children(self.launcher)
+            return True
+        alive = False
+        for proc in list(self.tracked.values()):
+            try:
+                if proc.is_running() and proc.status() != psutil.STATUS_ZOMBIE:
+                    self._track_children(proc)
+                    alive = True
+            except psutil.Error:
+                continue
+        return alive
+
+    def _end_marker_found(self):
+        for ext, marker in NASTRAN_END_MARKERS.items():
+            if marker.search(read_tail(self.output_file(ext))):
+                return True
+        return False
+
+    def _last_output_change(self):
+        times = [os.path.getmtime(self.output_file(ext)) for ext in NASTRAN_OUTPUTS
+                 if os.path.exists(self.output_file(ext))]
+        return max(times, default=self.exited_at)
+
+    def poll(self):
+        """Return the exit status once the job has finished, otherwise None"""
+        if self.returncode is not None:
+            return self.returncode
+        if self._tree_alive():
+            return None
+        if self.exited_at is None:
+            self.exited_at = time.time()
+
+        launcher_status = self.process.returncode
+        if not self._end_marker_found() and launcher_status == 0:
+            # The launcher may hand the run to a detached solver we never saw: the run
+            # only counts as finished once an end marker appears, wait() decides when to give up
+            return None
+
+        self.fatal = bool(NASTRAN_FATAL_MARKER.search(read_tail(self.output_file(".f06"))))
+        self.returncode = launcher_status if launcher_status else int(self.fatal)
+        return self.returncode
+
+    def kill(self):
+        """Kill the launcher and every solver process it started"""
+        procs = list(self.tracked.values())
+        if self.launcher is not None:
+            self._track_children(self.launcher)
+            procs = [self.launcher] + list(self.tracked.values())
+        for proc in procs:
+            try:
+                proc.kill()
+            except psutil.Error:
+                continue
+        psutil.wait_procs(procs, timeout=5)
+        self.process.poll()
+
+    def wait(self, timeout=None):
+        """Block until this job (and only this job) has finished and return its exit status.
+        When the wall-clock timeout expires first, the process tree is killed and timed_out is set.
+        Without a timeout, a detached run whose outputs stay unchanged for DETACHED_JOB_IDLE
+        seconds times out. unfinished is set when the launcher exited before any solver process
+        could be tracked, so the solver may still be running and cannot be killed."""
+        interval = JOB_POLL_MIN
+        while True:
+            status = self.poll()
+            if status is not None:
+                return status
+            now = time.time()
+            if timeout:
+                expired = now - self.started_at > timeout
+            else:
+                expired = (self.exited_at is not None and
+                           now - max(self._last_output_change(), self.exited_at) > DETACHED_JOB_IDLE)
+            if expired:
+                self.kill()
+                self.timed_out = True
+                self.unfinished = self.exited_at is not None and not self.tracked
+                self.returncode = self.process.returncode if self.process.returncode else -1
+                return self.returncode
+            time.sleep(interval)
+            interval = min(interval * 1.5, JOB_POLL_MAX)
+
+
+class EvaluationCache:
+    """Persistent SQLite cache of solved designs
+
+    Entries are keyed by a hash of the base deck, the selected properties, the response
+    setup and the multiplier vector quantised to `tolerance`. They store the extracted
+    responses, the mass and the compressed response rows kept in the response store, so a
+    cache hit can be stored like a solved iteration. Once `max_entries` is exceeded, the
+    least recently used entries are evicted.
+    """
+
+    def __init__(self, path, deck_hash, property_ids, response_spec, tolerance=1e-4, max_entries=100000):
+        self.tolerance = float(tolerance)
+        self.max_entries = int(max_entries)
+        # The multipliers are in property_ids order, so the key keeps that order
+        self.prefix = json.dumps([deck_hash, list(property_ids), response_spec]).encode()
+        self.conn = sqlite3.connect(path)
+        with self.conn:
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS evaluations (
+                key TEXT PRIMARY KEY, responses TEXT NOT NULL, mass REAL,
+                created REAL NOT NULL, last_used REAL NOT NULL, rows BLOB)""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON evaluations (last_used)")
+            # Caches written before the rows were stored
+            if "rows" not in [column[1] for column in self.conn.execute("PRAGMA table_info(evaluations)")]:
+                self.conn.execute("ALTER TABLE evaluations ADD COLUMN rows BLOB")
+
+    def key(self, multipliers):
+        quantised = np.round(np.asarray(multipliers, dtype=float) / self.tolerance).astype(np.int64)
+        return hashlib.sha256(self.prefix + quantised.tobytes()).hexdigest()
+
+    def get(self, multipliers):
+        """Return (responses, mass, (ids, data)) of a previously solved design, or None"""
+        key = self.key(multipliers)
+        row = self.conn.execute("SELECT responses, mass, rows FROM evaluations WHERE key = ?", (key,)).fetchone()
+        # Entries written before the rows were stored count as misses and are solved again
+        if row is None or row[2] is None:
+            return None
+        with self.conn:
+            self.conn.execute("UPDATE evaluations SET last_used = ? WHERE key = ?", (time.time(), key))
+        with np.load(io.BytesIO(row[2]), allow_pickle=False) as npz:
+            rows = (npz['ids'], npz['data'])
+        return json.loads(row[0]), row[1], rows
+
+    def put(self, multipliers, responses, mass, rows):
+        now = time.time()
+        responses = {name: float(value) for name, value in responses.items()}
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, ids=rows[0], data=rows[1])
+        with self.conn:
+            self.conn.execute("""INSERT OR REPLACE INTO evaluations (key, responses, mass, created, last_used, rows)
+                              VALUES (?, ?, ?, ?, ?, ?)""",
+                              (self.key(multipliers), json.dumps(responses),
+                               float(mass) if mass is not None else None, now, now, buffer.getvalue()))
+        self.evict()
+
+    def evict(self):
+        """Drop least recently used entries (plus 10% headroom) once the size limit is exceeded"""
+        count = self.conn.execute("SELECT COUNT(*) FROM evaluations").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        excess = count - self.max_entries + self.max_entries // 10
+        with self.conn:
+            self.conn.execute("""DELETE FROM evaluations WHERE key IN (
+                SELECT key FROM evaluations ORDER BY last_used ASC LIMIT ?)""", (excess,))
+
+    def close(self):
+        self.conn.close()
+
+
+class ParsedModel:
+    """A BDF and the arrays derived from it for the viewer, the labels and the engine
+
+    Nodes are sorted by ID with their global coordinates. Element connectivity is stored
+    flat: the node indices of element i are element_nodes[offsets[i]:offsets[i + 1]], -1 where a
+    node is not defined (e.g. the ground end of a CBUSH). element_pids is -1 for elements
+    without a property and centroids are NaN for elements without defined nodes. The property
+    table holds the optimized dimension of each property (see apply_multiplier) and its first
+    material, the material table the densities.
+
+    A model loaded from a snapshot has no BDF until bdf is first read, which parses the file.
+    mass and mass_coefficients (pid -> MassModel quadratic) are filled in as the engine
+    computes them and kept in the snapshot.
+    """
+    ARRAYS = ("node_ids", "coords", "element_ids", "element_types", "element_pids", "offsets", "element_nodes",
+              "centroids", "property_ids", "property_types", "property_values", "property_mids",
+              "material_ids", "material_types", "material_rho")
+
+    def __init__(self, path, bdf=None, arrays=None, snapshot=None):
+        self.path = os.path.abspath(path)
+        self._bdf = bdf
+        self.snapshot = snapshot
+        self.lock = threading.Lock()
+        self.mass = None
+        self.mass_coefficients = {}
+        for name, values in (arrays or self.model_arrays(bdf)).items():
+            setattr(self, name, values)
+
+    @property
+    def bdf(self):
+        with self.lock:
+            if self._bdf is None:
+                from pyNastran.bdf.bdf import read_bdf
+                self._bdf = read_bdf(self.path)
+            return self._bdf
+
+    @staticmethod
+    def model_arrays(bdf):
+        node_ids = np.array(sorted(bdf.nodes), dtype=int)
+        coords = np.array([bdf.nodes[nid].get_position() for nid in node_ids], dtype=float).reshape(-1, 3)
+
+        element_ids, types, pids, counts, connectivity = [], [], [], [], []
+        for eid, elem in bdf.elements.items():
+            try:
+                nids = [nid or 0 for nid in elem.node_ids]
+            except Exception:
+                nids = []
+            element_ids.append(eid)
+            types.append(elem.type)
+            pids.append(getattr(elem, 'pid', None) or -1)
+            counts.append(len(nids))
+            connectivity.extend(nids)
+        element_nodes = node_rows(node_ids, np.array(connectivity, dtype=int))
+
+        owner = np.repeat(np.arange(len(element_ids)), counts)
+        valid = element_nodes >= 0
+        n_nodes = np.bincount(owner[valid], minlength=len(element_ids))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            centroids = np.stack([np.bincount(owner[valid], weights=coords[element_nodes[valid], axis],
+                                              minlength=len(element_ids)) / n_nodes
+                                  for axis in range(3)], axis=1).reshape(-1, 3)
+
+        property_ids = sorted(bdf.properties)
+        values, mids = [], []
+        for pid in property_ids:
+            prop = bdf.properties[pid]
+            if prop.type == "PSHELL":
+                values.append(prop.t)
+            elif prop.type == "PCOMP":
+                values.append(prop.thicknesses[0])
+            elif prop.type == "PBARL":
+                values.append(prop.dim[0])
+            else:
+                values.append(np.nan)
+            try:
+                mids.append(prop.Mid() or -1)
+            except Exception:
+                mids.append(-1)
+        material_ids = sorted(bdf.materials)
+
+        return {
+            'node_ids': node_ids,
+            'coords': coords,
+            'element_ids': np.array(element_ids, dtype=int),
+            'element_types': np.array(types, dtype=str),
+            'element_pids': np.array(pids, dtype=int),
+            'offsets': np.concatenate([[0], np.cumsum(counts)]).astype(int),
+            'element_nodes': element_nodes,
+            'centroids': centroids,
+            'property_ids': np.array(property_ids, dtype=int),
+            'property_types': np.array([bdf.properties[pid].type for pid in property_ids], dtype=str),
+            'property_values': np.array(values, dtype=float),
+            'property_mids': np.array(mids, dtype=int),
+            'material_ids': np.array(material_ids, dtype=int),
+            'material_types': np.array([bdf.materials[mid].type for mid in material_ids], dtype=str),
+            'material_rho': np.array([getattr(bdf.materials[mid], 'rho', None) or 0.0 for mid in material_ids],
+                                     dtype=float),
+        }
+
+    def node_index(self, nids):
+        """Row of each node ID in node_ids/coords, -1 for IDs not in the model"""
+        return node_rows(self.node_ids, nids)
+
+    def element_corners(self, mask, n):
+        """(k, n) node indices of the first n nodes of the masked elements, -1 where undefined"""
+        starts = self.offsets[:-1][mask]
+        lengths = np.diff(self.offsets)[mask]
+        columns = np.arange(n)
+        rows = np.where(columns < lengths[:, None], starts[:, None] + columns, -1)
+        return np.where(rows >= 0, self.element_nodes[np.maximum(rows, 0)], -1)
+
+    def record_mass(self, mass):
+        self.mass = mass
+        if self.snapshot is not None:
+            self.snapshot.append("mass", np.float64(mass))
+
+    def record_mass_coefficients(self, coefficients):
+        """Keep MassModel coefficients (pid -> (x^2, x, 1)) that are not known yet"""
+        new = {pid: c for pid, c in coefficients.items() if pid not in self.mass_coefficients}
+        self.mass_coefficients.update(new)
+        if new and self.snapshot is not None:
+            self.snapshot.append("mass_coefficients", np.array([[pid, *c] for pid, c in new.items()], dtype=float))
+
+
+def node_rows(node_ids, nids):
+    """Position of each ID of nids in the sorted node_ids, -1 for IDs not present"""
+    nids = np.asarray(nids, dtype=int)
+    if not len(node_ids):
+        return np.full(nids.shape, -1)
+    rows = np.minimum(np.searchsorted(node_ids, nids), len(node_ids) - 1)
+    return np.where(node_ids[rows] == nids, rows, -1)
+
+
+class ModelSnapshot:
+    """Compressed sidecar of a BDF's ParsedModel arrays, written next to it after the first parse
+
+    The file is a zip of .npy members readable with np.load, plus "source.json" with the
+    SHA-256 of the BDF and every file it INCLUDEs. The snapshot is only used while all of them
+    match. Values computed later (the total mass, MassModel coefficients) are appended as
+    extra members, numbered so a member is never written twice.
+    """
+    VERSION = 1
+
+    def __init__(self, bdf_path):
+        self.path = bdf_path + SNAPSHOT_SUFFIX
+        self.lock = threading.Lock()
+
+    def load(self, bdf_path):
+        """The ParsedModel stored in the snapshot, or None if it is missing, stale or unreadable"""
+        try:
+            with zipfile.ZipFile(self.path) as archive:
+                source = json.loads(archive.read("source.json"))
+            if source['version'] != self.VERSION or any(
+                    not os.path.exists(name) or file_sha256(name) != digest for name, digest in source['files']):
+                return None
+            with np.load(self.path, allow_pickle=False) as npz:
+                arrays = {name: npz[name] for name in ParsedModel.ARRAYS}
+                extras = {name: npz[name] for name in npz.files if name not in arrays and name != "source.json"}
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+            return None
+
+        model = ParsedModel(bdf_path, arrays=arrays, snapshot=self)
+        for name in sorted(extras):
+            if name.startswith("mass_coefficients"):
+                model.mass_coefficients.update((int(row[0]), tuple(row[1:])) for row in extras[name])
+            elif name == "mass":
+                model.mass = float(extras[name])
+        return model
+
+    def write(self, model, source_files):
+        """Store the arrays of a freshly parsed model; a read-only location just means no snapshot"""
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, 'wb') as f:
+                np.savez_compressed(f, **{name: getattr(model, name) for name in ParsedModel.ARRAYS})
+            with zipfile.ZipFile(tmp, 'a', zipfile.ZIP_DEFLATED) as archive:
+                archive.writestr("source.json", json.dumps({
+                    'version': self.VERSION,
+                    'files': [[name, file_sha256(name)] for name in source_files]}))
+            os.replace(tmp, self.path)
+        except OSError:
+            return
+        model.snapshot = self
+
+    def append(self, name, value):
+        with self.lock:
+            try:
+                with zipfile.ZipFile(self.path, 'a', zipfile.ZIP_DEFLATED) as archive:
+                    existing = {member.filename for member in archive.infolist()}
+                    member = f"{name}.npy"
+                    n = 1
+                    while member in existing:
+                        member = f"{name}_{n}.npy"
+                        n += 1
+                    with archive.open(member, 'w') as f:
+                        np.lib.format.write_array(f, np.asarray(value), allow_pickle=False)
+            except OSError:
+                pass
+
+
+class ModelCache:
+    """Parsed models shared by the 3D viewer, the label overlays and the engine
+
+    Entries are keyed by path and checked against the file's mtime and size on every get, so
+    a changed deck is read again and its old entry evicted. The max_models most recently used
+    decks are kept. With snapshots, a deck is loaded from its ModelSnapshot when that is still
+    valid, and a snapshot is written after parsing it otherwise. Users of the BDF object must
+    leave it as they found it.
+    """
+
+    def __init__(self, max_models=2, snapshots=True):
+        self.max_models = max(1, int(max_models))
+        self.snapshots = snapshots
+        self.models = {}  # path -> ((path, mtime, size), ParsedModel), least recently used first
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            entry = self.models.pop(path, None)
+            if entry is None or entry[0] != key:
+                entry = (key, self.load(path))
+            self.models[path] = entry
+            while len(self.models) > self.max_models:
+                del self.models[next(iter(self.models))]
+            return entry[1]
+
+    def load(self, path):
+        snapshot = ModelSnapshot(path) if self.snapshots else None
+        model = snapshot.load(path) if snapshot is not None else None
+        if model is None:
+            from pyNastran.bdf.bdf import read_bdf
+            bdf = read_bdf(path)
+            model = ParsedModel(path, bdf)
+            if snapshot is not None:
+                snapshot.write(model, [os.path.abspath(name) for name in bdf.active_filenames])
+        return model
+
+    def evict(self, path):
+        with self.lock:
+            self.models.pop(os.path.abspath(path), None)
+
+
+MODEL_CACHE = ModelCache()
+
+
+class MassModel:
+    """Structural mass as a cheap function of the property multipliers
+
+    At study start, each selected property's mass contribution is evaluated with
+    mass_properties at three multipliers. A quadratic through those points is exact,
+    because mass is linear in PSHELL/PCOMP thickness and at most quadratic in PBARL dim[0].
+    Everything else becomes a fixed mass. Coefficients in known (pid -> quadratic, e.g. from
+    a model snapshot) are reused instead of evaluated.
+    """
+    SAMPLES = (0.5, 1.0, 1.5)
+
+    def __init__(self, bdf, property_ids, original_values, total_mass, known=None):
+        from pyNastran.bdf.mesh_utils.mass_properties import mass_properties
+        eids_by_pid = {}
+        for eid, elem in bdf.elements.items():
+            pid = elem.pid if hasattr(elem, 'pid') else None
+            eids_by_pid.setdefault(pid, set()).add(eid)
+
+        coefficients = []
+        for pid in property_ids:
+            if known and pid in known:
+                coefficients.append(known[pid])
+                continue
+            eids = eids_by_pid.get(pid)
+            if original_values[pid] is None or not eids:
+                coefficients.append((0.0, 0.0, 0.0))
+                continue
+            prop = bdf.properties[pid]
+            samples = []
+            for multiplier in self.SAMPLES:
+                apply_multiplier(prop, original_values[pid], multiplier)
+                # mass_ids=None leaves out every lumped mass; an empty list would fail
+                # on models without CONM2/CMASS cards
+                samples.append(mass_properties(bdf, element_ids=eids, mass_ids=None)[0])
+            apply_multiplier(prop, original_values[pid], 1.0)
+            coefficients.append(np.polyfit(self.SAMPLES, samples, 2))
+
+        self.coefficients = np.asarray(coefficients, dtype=float)  # (n_properties, 3): x^2, x, 1
+        self.fixed_mass = total_mass - self.coefficients.sum()
+
+    def mass(self, multipliers):
+        """Mass of one design, or of many at once for a (..., n_properties) array"""
+        x = np.asarray(multipliers, dtype=float)
+        c2, c1, c0 = self.coefficients.T
+        total = self.fixed_mass + np.sum((c2 * x + c1) * x + c0, axis=-1)
+        return float(total) if np.ndim(total) == 0 else total
+
+
+class IncrementalDeckWriter:
+    """Writes the model once as a frozen master deck without the optimized properties.
+    Each job deck INCLUDEs the master and only adds the edited property cards."""
+
+    def __init__(self, bdf, property_ids, root):
+        self.bdf = bdf
+        self.property_ids = list(property_ids)
+        self.master = os.path.join(root, MASTER_DECK)
+        # Write from a filtered view: the shared model's property dict, and with it the
+        # property order later studies see, stays untouched
+        properties = bdf.properties
+        edited = set(self.property_ids)
+        bdf.properties = {pid: prop for pid, prop in properties.items() if pid not in edited}
+        try:
+            bdf.write_bdf(self.master, enddata=False)
+        finally:
+            bdf.properties = properties
+
+    def write(self, bdf_path):
+        include = os.path.relpath(self.master, os.path.dirname(bdf_path))
+        with open(bdf_path, 'w') as f:
+            f.write(f"INCLUDE '{include}'\n")
+            f.write("$ Optimized properties\n")
+            for pid in self.property_ids:
+                f.write(self.bdf.properties[pid].write_card(size=8))
+            f.write("ENDDATA\n")
+
+
+class ResponseIndex:
+    """ID -> row lookup for OP2 result tables
+
+    The sorted IDs are built once and reused for as long as a table has the same IDs, which
+    holds for every iteration of a study. Each lookup is a single searchsorted call.
+    """
+
+    def __init__(self):
+        self.state = None
+        self.masks = {}
+
+    def rows(self, ids, wanted):
+        state = self.state
+        if state is None or not np.array_equal(state[0], ids):
+            order = np.argsort(ids, kind='stable')
+            state = (np.array(ids), order, ids[order])
+            self.state = state
+            self.masks = {}
+        _, order, sorted_ids = state
+
+        wanted = np.asarray(wanted)
+        pos = np.clip(np.searchsorted(sorted_ids, wanted), 0, len(sorted_ids) - 1)
+        found = sorted_ids[pos] == wanted
+        if not found.all():
+            raise ValueError(f"IDs not found in results: {wanted[~found][:10].tolist()}")
+        return order[pos]
+
+    def set_rows(self, ids, name, ranges):
+        """Rows of the IDs in a named set, cached alongside the ID index"""
+        self.rows(ids, [])
+        key = (name, None if ranges is None else tuple(ranges))
+        if key not in self.masks:
+            rows = np.flatnonzero(ids_in_ranges(ids, ranges))
+            if rows.size == 0:
+                raise ValueError(f"Set '{name}' has no IDs in the results")
+            self.masks[key] = rows
+        return self.masks[key]
+
+
+class ResponseStore:
+    """Append-only compressed store of the monitored response rows of every solved iteration
+
+    The file is a zip of .npy members readable with np.load: "study.json" describes the run
+    and each iteration adds "<n>_ids", "<n>_data" (all result columns), "<n>_mass" and
+    "<n>_multipliers". Members are appended as iterations finish, so a stopped run keeps
+    everything solved so far.
+    """
+
+    def __init__(self, path, study=None):
+        self.path = path
+        if study is not None:
+            with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+                archive.writestr("study.json", json.dumps(study))
+
+    def append(self, iteration, ids, data, mass, multipliers):
+        arrays = {'ids': ids, 'data': data, 'mass': np.nan if mass is None else mass,
+                  'multipliers': multipliers}
+        with zipfile.ZipFile(self.path, 'a', zipfile.ZIP_DEFLATED) as archive:
+            for key, value in arrays.items():
+                with archive.open(f"{iteration}_{key}.npy", 'w') as member:
+                    np.lib.format.write_array(member, np.asarray(value))
+
+    def load(self):
+        """Return (study, iterations) with iterations a list of dicts sorted by iteration"""
+        with zipfile.ZipFile(self.path) as archive:
+            study = json.loads(archive.read("study.json"))
+        iterations = {}
+        with np.load(self.path) as npz:
+            for name in npz.files:
+                if name == "study.json":
+                    continue
+                iteration, key = name.split("_", 1)
+                iterations.setdefault(int(iteration), {'iteration': int(iteration)})[key] = npz[name]
+        return study, [iterations[i] for i in sorted(iterations)]
+
+
+class HistoryStore:
+    """Append-only columnar history: one raw binary file per column plus schema.json
+
+    A column is (name, dtype, width); width > 1 stores a fixed-length vector per row, such as the
+    multipliers. Every appended row is flushed to disk, and a row cut short by a crash is
+    dropped when the store is reopened, so the columns always stay aligned.
+    """
+
+    def __init__(self, root, columns=None):
+        self.root = os.path.abspath(root)
+        self.schema_file = os.path.join(self.root, "schema.json")
+        if columns is not None:
+            os.makedirs(self.root, exist_ok=True)
+            self.schema = {'columns': [list(column) for column in columns], 'statuses': list(STATUSES)}
+            with open(self.schema_file, 'w') as f:
+                json.dump(self.schema, f)
+            for name, _, _ in self.schema['columns']:
+                open(self._path(name), 'wb').close()
+        else:
+            with open(self.schema_file) as f:
+                self.schema = json.load(f)
+        self.columns = [(name, np.dtype(dtype), width) for name, dtype, width in self.schema['columns']]
+        self.statuses = self.schema['statuses']
+
+        self.rows = min(os.path.getsize(self._path(name)) // (dtype.itemsize * width)
+                        for name, dtype, width in self.columns)
+        self.files = {}
+        for name, dtype, width in self.columns:
+            f = open(self._path(name), 'ab')
+            f.truncate(self.rows * dtype.itemsize * width)
+            self.files[name] = f
+
+    def _path(self, name):
+        return os.path.join(self.root, f"{name}.bin")
+
+    def __len__(self):
+        return self.rows
+
+    def append(self, row):
+        """Append one row; missing values are stored as NaN (-1 for integer columns)"""
+        for name, dtype, width in self.columns:
+            value = row.get(name)
+            if name == 'Status':
+                value = self.statuses.index(value)
+            elif value is None:
+                value = np.nan if dtype.kind == 'f' else -1
+            f = self.files[name]
+            f.write(np.broadcast_to(np.asarray(value, dtype=dtype), (width,)).tobytes())
+        for f in self.files.values():
+            f.flush()
+            os.fsync(f.fileno())
+        self.rows += 1
+
+    def column(self, name):
+        """All complete rows of a column, (rows,) or (rows, width)"""
+        _, dtype, width = next(column for column in self.columns if column[0] == name)
+        data = np.fromfile(self._path(name), dtype=dtype, count=self.rows * width)
+        return data.reshape(self.rows, width) if width > 1 else data
+
+    def to_frame(self, names=None):
+        """DataFrame of the scalar columns (or the given names), sorted by Iteration"""
+        import pandas as pd
+        columns = {}
+        for name, _, width in self.columns:
+            if width == 1 and (names is None or name in names):
+                columns[name] = self.column(name)
+        df = pd.DataFrame(columns)
+        if 'Status' in df:
+            df['Status'] = [self.statuses[code] for code in df['Status']]
+        return df.sort_values('Iteration', kind='stable').reset_index(drop=True) if 'Iteration' in df else df
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        self.files = {}
+
+
+def history_columns(variable_names, n_properties):
+    """HistoryStore columns of a study: bookkeeping, objective variables, multipliers and the optimizer's x/y"""
+    return ([("Iteration", "<i8", 1), ("Result", "<f8", 1), ("Status", "|i1", 1), ("Attempts", "<i4", 1),
+             ("Mass", "<f8", 1)]
+            + [(name, "<f8", 1) for name in variable_names]
+            + [("Multipliers", "<f8", n_properties), ("X", "<f8", n_properties), ("Objective", "<f8", 1)])
+
+
+class StudyCheckpoint:
+    """Checkpoint of a running study in its own directory
+
+    study.json holds the study configuration, the model hash, the property IDs and the optimizer state
+    and is replaced atomically. The history store next to it gets one row per finished evaluation
+    (the history row plus the optimizer's design vector X and the objective told to it), flushed
+    to disk before the optimizer moves on.
+    """
+
+    def __init__(self, root, study=None, columns=None):
+        self.root = os.path.abspath(root)
+        self.study_file = os.path.join(self.root, "study.json")
+        if study is None:
+            with open(self.study_file) as f:
+                self.study = json.load(f)
+            self.history = HistoryStore(self.root)
+        else:
+            os.makedirs(self.root, exist_ok=True)
+            self.study = dict(study, state={})
+            self._write_study()
+            self.history = HistoryStore(self.root, columns)
+
+    def _write_study(self):
+        tmp = self.study_file + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.study, f, default=float)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.study_file)
+
+    def save_state(self, **state):
+        self.study['state'].update(state)
+        self._write_study()
+
+    def append(self, x, y, row):
+        self.history.append(dict(row, X=x, Objective=y))
+
+    def evaluations(self):
+        """Recorded evaluations in completion order, as dicts with x, y and the history row"""
+        history = self.history
+        columns = {name: history.column(name) for name, _, _ in history.columns}
+        records = []
+        for i in range(len(history)):
+            row = {name: values[i].tolist() for name, values in columns.items() if name not in ("X", "Objective")}
+            row['Status'] = history.statuses[row['Status']]
+            row['Mass'] = None if np.isnan(row['Mass']) else row['Mass']
+            if not isinstance(row['Multipliers'], list):
+                row['Multipliers'] = [row['Multipliers']]
+            x = columns['X'][i].tolist()
+            records.append({'x': x if isinstance(x, list) else [x], 'y': float(columns['Objective'][i]), 'row': row})
+        return records
+
+    def close(self):
+        self.history.close()
+
+
+def rng_state(rng):
+    """JSON-friendly state of a numpy RandomState"""
+    name, keys, pos, has_gauss, cached = rng.get_state()
+    return [name, keys.tolist(), pos, has_gauss, cached]
+
+
+class ObjectiveExpression:
+    """Objective function expression, parsed, validated and compiled once per study
+
+    For evaluate_batch a second, element-wise version is compiled: conditional expressions,
+    and/or, not and chained comparisons become np.where/np.logical_* calls. Expressions that
+    call the numpy reductions (np.max, np.mean, ...) would reduce across rows, so they, and any
+    rows the batch version cannot handle, are evaluated one at a time.
+
+    Of numpy, only ufuncs, NUMPY_EXTRAS and NUMPY_CONSTANTS may be used: study files can come
+    from anywhere, and functions such as np.save or np.load must not be reachable.
+    """
+    FUNCTIONS = {'abs': abs, 'sqrt': np.sqrt, 'np': np, 'sin': np.sin, 'cos': np.cos,
+                 'tan': np.tan, 'exp': np.exp, 'log': np.log}
+    NUMPY_ELEMENTWISE = frozenset({'where', 'clip', 'round'})
+    NUMPY_EXTRAS = NUMPY_ELEMENTWISE | {'max', 'min', 'mean', 'sum'}
+    NUMPY_CONSTANTS = frozenset({'pi', 'e', 'inf'})
+    NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.BoolOp, ast.IfExp, ast.Call,
+             ast.Name, ast.Load, ast.Constant, ast.Attribute, ast.operator, ast.unaryop, ast.cmpop,
+             ast.boolop, ast.Tuple, ast.List)
+
+    def __init__(self, expression, variable_names):
+        self.expression = expression.strip()
+        try:
+            tree = ast.parse(self.expression, mode='eval')
+        except SyntaxError as e:
+            raise ValueError(f"Invalid objective function '{self.expression}': {e.msg}")
+
+        allowed = set(variable_names) | set(self.FUNCTIONS)
+        for node in ast.walk(tree):
+            if not isinstance(node, self.NODES):
+                raise ValueError(f"'{type(node).__name__}' is not allowed in the objective function")
+            if isinstance(node, ast.Name) and node.id not in allowed:
+                available = ", ".join(variable_names) or "none"
+                raise ValueError(f"Unknown name '{node.id}' in objective function (available variables: {available})")
+            if isinstance(node, ast.Attribute) and (
+                    not isinstance(node.value, ast.Name) or node.value.id != 'np' or not self.numpy_allowed(node.attr)):
+                raise ValueError(f"'{ast.unparse(node)}' is not allowed in the objective function")
+
+        self.names = sorted({node.id for node in ast.walk(tree) if isinstance(node, ast.Name)} & set(variable_names))
+        self.code = compile(tree, '<objective>', 'eval')
+        self.elementwise = all(node.attr in self.NUMPY_CONSTANTS or node.attr in self.NUMPY_ELEMENTWISE
+                               or isinstance(getattr(np, node.attr), np.ufunc)
+                               for node in ast.walk(tree) if isinstance(node, ast.Attribute))
+        batch_tree = ast.fix_missing_locations(self._vectorize(ast.parse(self.expression, mode='eval')))
+        self.batch_code = compile(batch_tree, '<objective>', 'eval')
+
+    @classmethod
+    def numpy_allowed(cls, name):
+        """Whether np.<name> may appear in an objective function"""
+        if name in cls.NUMPY_EXTRAS or name in cls.NUMPY_CONSTANTS:
+            return True
+        return not name.startswith('_') and isinstance(getattr(np, name, None), np.ufunc)
+
+    @staticmethod
+    def _vectorize(tree):
+        """Rewrite the scalar-only constructs of an expression tree into element-wise numpy calls"""
+        def np_call(name, *args):
+            return ast.Call(func=ast.Attribute(value=ast.Name(id='np', ctx=ast.Load()), attr=name, ctx=ast.Load()),
+                            args=list(args), keywords=[])
+
+        class Vectorize(ast.NodeTransformer):
+            def visit_IfExp(self, node):
+                self.generic_visit(node)
+                return np_call('where', node.test, node.body, node.orelse)
+
+            def visit_BoolOp(self, node):
+                # "a and b" is b where a holds, else a; "a or b" is a where a holds, else b
+                self.generic_visit(node)
+                result = node.values[-1]
+                for value in reversed(node.values[:-1]):
+                    if isinstance(node.op, ast.And):
+                        result = np_call('where', value, result, value)
+                    else:
+                        result = np_call('where', value, value, result)
+                return result
+
+            def visit_UnaryOp(self, node):
+                self.generic_visit(node)
+                return np_call('logical_not', node.operand) if isinstance(node.op, ast.Not) else node
+
+            def visit_Compare(self, node):
+                self.generic_visit(node)
+                operands = [node.left] + node.comparators
+                parts = [ast.Compare(left=left, ops=[op], comparators=[right])
+                         for left, op, right in zip(operands, node.ops, operands[1:])]
+                result = parts[0]
+                for part in parts[1:]:
+                    result = np_call('logical_and', result, part)
+                return result
+
+        return Vectorize().visit(tree)
+
+    def _eval(self, values, code=None):
+        namespace = dict(self.FUNCTIONS, __builtins__={})
+        namespace.update(values)
+        try:
+            return eval(self.code if code is None else code, namespace)
+        except Exception as e:
+            raise ValueError(f"Error evaluating objective function: {e}")
+
+    def __call__(self, values):
+        return float(self._eval(values))
+
+    def evaluate_batch(self, columns):
+        """Evaluate many response vectors at once; columns maps variable names to equal-length arrays"""
+        arrays = {name: np.asarray(columns[name], dtype=float) for name in self.names}
+        n = len(next(iter(columns.values()))) if columns else 1
+        try:
+            if self.elementwise:
+                return np.broadcast_to(np.asarray(self._eval(arrays, self.batch_code), dtype=float), (n,)).copy()
+        except ValueError:
+            pass
+        return np.array([self({name: values[i] for name, values in arrays.items()}) for i in range(n)])
+
+
+class SolverPool:
+    """Runs up to max_solves Nastran jobs at once, each in its own working directory
+
+    root holds the job directories (e.g. a RAM disk or local SSD) and scratch, if given, is
+    passed to Nastran as sdirectory. Finished job directories are removed by a background
+    worker so deleting large outputs never holds up the optimizer.
+
+    Deck writing and OP2 parsing run as separate single-thread stages in front of and behind
+    the solvers, so the next deck is written and the last OP2 parsed while Nastran is busy.
+    Only the deck stage, and the exact mass check under the same lock, touch the shared BDF model.
+    """
+
+    def __init__(self, nastran_path, max_solves, root=JOB_ROOT, scratch=None):
+        self.nastran_path = nastran_path
+        self.max_solves = max(1, int(max_solves))
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+        self.scratch = os.path.abspath(scratch) if scratch else None
+        if self.scratch:
+            os.makedirs(self.scratch, exist_ok=True)
+        self.decks = ThreadPoolExecutor(max_workers=1, thread_name_prefix="deck")
+        self.executor = ThreadPoolExecutor(max_workers=self.max_solves, thread_name_prefix="nastran")
+        self.parser = ThreadPoolExecutor(max_workers=1, thread_name_prefix="parse")
+        self.cleaner = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cleanup")
+
+    @property
+    def args(self):
+        """Nastran keywords shared by every job"""
+        return ("scr=yes",) + ((f"sdirectory={self.scratch}",) if self.scratch else ())
+
+    def job_dir(self, job_name):
+        """Create (or empty) the working directory of a job"""
+        job_dir = os.path.join(self.root, job_name)
+        if os.path.isdir(job_dir):
+            shutil.rmtree(job_dir, ignore_errors=True)
+        os.makedirs(job_dir, exist_ok=True)
+        return job_dir
+
+    def submit_deck(self, fn, *args):
+        return self.decks.submit(fn, *args)
+
+    def submit(self, fn, *args):
+        return self.executor.submit(fn, *args)
+
+    def submit_parse(self, fn, *args):
+        return self.parser.submit(fn, *args)
+
+    def remove_job(self, job_dir):
+        """Delete a job directory in the background"""
+        self.cleaner.submit(shutil.rmtree, job_dir, ignore_errors=True)
+
+    def shutdown(self, cancel=False):
+        for executor in (self.decks, self.executor, self.parser):
+            executor.shutdown(wait=not cancel, cancel_futures=cancel)
+        # Pending removals are cheap compared to solves, let them finish
+        self.cleaner.shutdown(wait=True)
+
+class DesignArchive:
+    """Keeps the job directories of the K best designs under root
+
+    Designs are ranked by score (lower is better). Entering designs are moved out of the job
+    root, demoted bests are optionally zipped and designs pushed out of the top K are
+    deleted. All file operations run in order on one background worker. A copy of the
+    incremental master deck is kept next to the designs so their INCLUDEs still resolve.
+    """
+
+    def __init__(self, root, keep, compress=False, master=None):
+        self.root = os.path.abspath(root)
+        self.keep = max(1, int(keep))
+        self.compress = compress
+        os.makedirs(self.root, exist_ok=True)
+        if master:
+            shutil.copy2(master, os.path.join(self.root, os.path.basename(master)))
+        self.entries = []  # [score, iteration, path], best first
+        self.worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="archive")
+
+    def ranks(self, score):
+        """Whether a design with this score would enter the top K"""
+        return not np.isnan(score) and (len(self.entries) < self.keep or score < self.entries[-1][0])
+
+    def offer(self, iteration, score, job_dir):
+        """Keep job_dir if the design ranks in the top K; returns its new directory, or None"""
+        if not self.ranks(score):
+            return None
+        path = os.path.join(self.root, os.path.basename(job_dir))
+        entry = [score, iteration, path]
+        bisect.insort(self.entries, entry, key=lambda e: e[0])
+        self.worker.submit(shutil.move, job_dir, path)
+
+        if self.compress and self.entries[0] is entry and len(self.entries) > 1:
+            demoted = self.entries[1]
+            self.worker.submit(self._compress, demoted[2])
+            demoted[2] += ".zip"
+        while len(self.entries) > self.keep:
+            self.worker.submit(self._remove, self.entries.pop()[2])
+        return path
+
+    def adopt(self, iteration, score, name):
+        """Register a design kept by an earlier session of the study; returns its path, or None"""
+        path = os.path.join(self.root, name)
+        if not os.path.exists(path):
+            path += ".zip"
+            if not os.path.exists(path):
+                return None
+        bisect.insort(self.entries, [score, iteration, path], key=lambda e: e[0])
+        while len(self.entries) > self.keep:
+            self.worker.submit(self._remove, self.entries.pop()[2])
+        return path
+
+    @staticmethod
+    def _compress(path):
+        with zipfile.ZipFile(path + ".zip", 'w', zipfile.ZIP_DEFLATED) as archive:
+            for name in os.listdir(path):
+                archive.write(os.path.join(path, name), os.path.join(os.path.basename(path), name))
+        shutil.rmtree(path, ignore_errors=True)
+
+    @staticmethod
+    def _remove(path):
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            os.remove(path)
+
+    def close(self):
+        self.worker.shutdown(wait=True)
+
+
+# Choices accepted by StudyConfig
+RESULT_TYPES = tuple(RESULT_TABLES)
+MODES = ("minimize", "maximize", "target")
+METHODS = ("Gaussian Process", "Boosted Trees", "Differential Evo")
+MASS_LIMIT_UNITS = ("% change", "absolute")
+MASS_LIMIT_ACTIONS = ("Reject", "Project")
+
+
+def log_message(message):
+    """Default engine log: timestamped lines on stdout"""
+    print(f"{time.strftime('%H:%M:%S')} - {message}", flush=True)
+
+
+def new_run_dir(root=RUN_ROOT):
+    """Create a fresh timestamped directory under root for the outputs of one study"""
+    base = os.path.join(root, time.strftime("%Y%m%d-%H%M%S"))
+    path, n = base, 1
+    while os.path.exists(path):
+        path = f"{base}_{n}"
+        n += 1
+    os.makedirs(path)
+    return path
+
+
+def latest_checkpoint(root=RUN_ROOT):
+    """Checkpoint of the most recent study under root, or CHECKPOINT_DIR if there is none"""
+    runs = sorted(name for name in os.listdir(root)
+                  if os.path.isdir(os.path.join(root, name, CHECKPOINT_DIR))) if os.path.isdir(root) else []
+    return os.path.join(root, runs[-1], CHECKPOINT_DIR) if runs else CHECKPOINT_DIR
+
+
+def select_properties(prop_string, all_property_ids):
+    """Property IDs matched by a selection string, as (selected, single IDs missing from the model)
+
+    The selected IDs are sorted, so the multiplier vector of a study has the same order
+    whichever way its properties were selected.
+    """
+    ranges = parse_id_ranges(prop_string)
+    if ranges is None:
+        return sorted(all_property_ids), []
+    selected_ids = []
+    missing = []
+    for start_id, end_id in ranges:
+        if start_id == end_id and start_id not in all_property_ids:
+            missing.append(start_id)
+            continue
+        for pid in all_property_ids:
+            if start_id <= pid <= end_id:
+                selected_ids.append(pid)
+    return sorted(set(selected_ids)), missing
+
+
+def apply_mass_penalty(result, current_mass, mode, initial_mass, penalty_factor):
+    """Penalize mass growth; result and current_mass may be scalars or arrays (NaN mass: no penalty)"""
+    if penalty_factor is None or initial_mass is None or current_mass is None:
+        return result
+    mass_change = np.nan_to_num((np.asarray(current_mass, dtype=float) - initial_mass) / initial_mass)
+    if mode == 'minimize':
+        penalized = result * (1.0 + penalty_factor * np.maximum(0, mass_change))
+    elif mode == 'maximize':
+        penalized = result / (1.0 + penalty_factor * np.maximum(0, mass_change))
+    elif mode == 'target':
+        penalized = result * (1.0 + penalty_factor * np.maximum(0, mass_change))
+    else:
+        penalized = result
+    return penalized
+
+
+def rescore_responses(iterations, variables, response_sets, component, objective_expr, mode, target,
+                      initial_mass, penalty_factor):
+    """Results and penalized objectives of stored iterations (see ResponseStore.load)"""
+    # Iterations of one study share the same response rows, so they are stacked and
+    # scored in one go; groups only differ if the model output changed mid-run
+    groups = {}
+    for it in iterations:
+        groups.setdefault(it['ids'].tobytes(), []).append(it)
+    scored = {}
+    for group in groups.values():
+        data = np.stack([it['data'] for it in group])
+        columns = response_variables(group[0]['ids'], data, variables, response_sets, component, ResponseIndex())
+        for it, result in zip(group, objective_expr.evaluate_batch(columns)):
+            scored[it['iteration']] = result
+    results = np.array([scored[it['iteration']] for it in iterations])
+    masses = np.array([float(it['mass']) for it in iterations])
+    objectives = apply_mass_penalty(score_results(results, mode, target), masses, mode, initial_mass, penalty_factor)
+    return results, objectives
+
+
+@dataclass(frozen=True)
+class StudyConfig:
+    """Everything one optimization study needs, fixed before the study starts
+
+    Read from JSON, YAML or TOML files whose keys are the field names; missing keys take the
+    defaults below. Values are converted to the field types on construction, so a study built
+    from a file, the GUI or a checkpoint compares equal. mass_penalty_factor and mass_limit are
+    None when disabled, solve_timeout 0 means no timeout.
+    """
+    bdf_path: str
+    nastran_path: str
+    variables: tuple = ()
+    response_sets: str = ""
+    objective: str = "w1"
+    result_type: str = "displacement"
+    component: str = "XYZ"
+    mode: str = "minimize"
+    target: float = 1.0
+    property_selection: str = "All"
+    min_bound: float = 0.1
+    max_bound: float = 5.0
+    method: str = "Gaussian Process"
+    n_calls: int = 30
+    mass_penalty_factor: float = None
+    mass_limit: float = None
+    mass_limit_unit: str = "% change"
+    mass_limit_action: str = "Reject"
+    max_solves: int = 1
+    solve_timeout: float = 3600.0
+    solve_retries: int = 1
+    retry_memory: tuple = ()
+    job_root: str = JOB_ROOT
+    scratch_dir: str = ""
+    use_cache: bool = True
+    cache_tolerance: float = 1e-4
+    cache_size: int = 100000
+    incremental_decks: bool = False
+    mass_check_every: int = 0
+    trim_output: bool = False
+    excel_report: bool = True
+    keep_best: int = 5
+    compress_kept: bool = False
+    warm_start: str = ""
+
+    def __post_init__(self):
+        for f in fields(self):
+            value = getattr(self, f.name)
+            if f.type is tuple:
+                items = value.split(',') if isinstance(value, str) else value
+                value = tuple(item.strip() if isinstance(item, str) else item for item in items)
+                value = tuple(item for item in value if item != "")
+            elif value is not None:
+                value = f.type(value)
+            object.__setattr__(self, f.name, value)
+        object.__setattr__(self, 'variables', tuple(int(v) for v in self.variables))
+
+        for name, choices in (('result_type', RESULT_TYPES), ('component', tuple(COMPONENT_AXES)),
+                              ('mode', MODES), ('method', METHODS), ('mass_limit_unit', MASS_LIMIT_UNITS),
+                              ('mass_limit_action', MASS_LIMIT_ACTIONS)):
+            if getattr(self, name) not in choices:
+                raise ValueError(f"{name} must be one of {', '.join(choices)}, not '{getattr(self, name)}'")
+        if not self.variables and not self.response_ranges():
+            raise ValueError("Must specify at least one variable or response set")
+        if self.min_bound >= self.max_bound:
+            raise ValueError("min_bound must be smaller than max_bound")
+        if self.n_calls < 1:
+            raise ValueError("n_calls must be at least 1")
+        # Catch bad expressions before the first (expensive) solve
+        self.compile_objective()
+
+    @classmethod
+    def from_dict(cls, values):
+        unknown = sorted(set(values) - {f.name for f in fields(cls)})
+        if unknown:
+            raise ValueError(f"Unknown study settings: {', '.join(unknown)}")
+        return cls(**values)
+
+    @classmethod
+    def from_file(cls, path):
+        """Read a study from a .json, .yaml/.yml or .toml file"""
+        ext = os.path.splitext(path)[1].lower()
+        if ext == ".json":
+            with open(path) as f:
+                values = json.load(f)
+        elif ext in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("Reading YAML study files requires PyYAML")
+            with open(path) as f:
+                values = yaml.safe_load(f) or {}
+        elif ext == ".toml":
+            import tomllib
+            with open(path, 'rb') as f:
+                values = tomllib.load(f)
+        else:
+            raise ValueError(f"Unsupported study file type '{ext}' (use .json, .yaml or .toml)")
+        return cls.from_dict(values)
+
+    @classmethod
+    def from_checkpoint(cls, root):
+        """The configuration a checkpointed study was started with"""
+        checkpoint = StudyCheckpoint(root)
+        checkpoint.close()
+        if 'config' not in checkpoint.study:
+            raise ValueError(f"The checkpoint in {root} holds no study configuration")
+        return cls.from_dict(checkpoint.study['config'])
+
+    def to_dict(self):
+        return {f.name: list(value) if isinstance(value, tuple) else value
+                for f in fields(self) for value in [getattr(self, f.name)]}
+
+    def save(self, path):
+        """Write the study to a .json or .yaml/.yml file (disabled options are left out)"""
+        values = {name: value for name, value in self.to_dict().items() if value is not None}
+        ext = os.path.splitext(path)[1].lower()
+        with open(path, 'w') as f:
+            if ext in (".yaml", ".yml"):
+                import yaml
+                yaml.safe_dump(values, f, sort_keys=False)
+            else:
+                json.dump(values, f, indent=2)
+
+    def response_ranges(self):
+        return parse_response_sets(self.response_sets)
+
+    def compile_objective(self):
+        """Parse, validate and compile the objective function against the available variables"""
+        return ObjectiveExpression(self.objective, response_variable_names(self.variables, self.response_ranges()))
+
+    @property
+    def target_value(self):
+        return self.target if self.mode == 'target' else None
+
+    def mass_limit_for(self, initial_mass):
+        """Absolute mass budget, or None when disabled"""
+        if self.mass_limit is None:
+            return None
+        if self.mass_limit_unit == "absolute":
+            return self.mass_limit
+        if initial_mass is None:
+            return None
+        return initial_mass * (1.0 + self.mass_limit / 100.0)
+
+
+class OptimizationEngine:
+    """Runs one study from a StudyConfig, without any GUI
+
+    Progress is reported through callbacks: log(message), which may be called from worker
+    threads, progress(completed, iteration, result, best_result, mass, is_new_best) and
+    mass(initial_mass). stop() may be called from any thread; run() then raises StopIteration
+    once the evaluations in flight have finished. resume_dir continues a checkpointed study.
+
+    Every new study writes its checkpoint, kept designs and response store to its own run_dir
+    under RUN_ROOT, so earlier results are never overwritten. A resumed study continues in the
+    directory that holds its checkpoint.
+    """
+
+    def __init__(self, config, log=log_message, progress=None, mass=None, resume_dir=None):
+        self.config = config
+        self.log = log
+        self.progress = progress or self.log_progress
+        self.mass = mass or (lambda initial_mass: None)
+        self.resume_dir = resume_dir
+        self.run_dir = os.path.dirname(os.path.abspath(resume_dir)) if resume_dir else None
+        self.stopped = threading.Event()
+        self.initial_mass = None
+        self.load_case = None
+        self.best_bdf_name = None
+        self.response_index = ResponseIndex()
+
+    def stop(self):
+        self.stopped.set()
+
+    def log_progress(self, completed, iteration, result, best_result, current_mass, is_new_best):
+        marker = " *" if is_new_best else ""
+        mass_info = f" | Mass: {current_mass:.5f}" if current_mass is not None else ""
+        self.log(f"[{completed}/{self.config.n_calls}] Iter {iteration} | Result: {result:.5f} | "
+                 f"Best: {best_result:.5f}{mass_info}{marker}")
+
+    def get_mass(self, bdf):
+        from pyNastran.bdf.mesh_utils.mass_properties import mass_properties
+        try:
+            mass, cg, I = mass_properties(bdf)
+            return mass
+        except Exception as e:
+            self.log(f"Warning: Could not calculate mass: {e}")
+            return None
+
+    def read_result_table(self, op2_name, result_type):
+        """Read only the result table of result_type for the active subcase
+
+        Returns (ids, data): the node/element IDs and the (n, 6) array of the first time step,
+        taken straight from pyNastran's numpy arrays without building dataframes.
+        """
+        from pyNastran.op2.op2 import read_op2
+        subcases = [self.load_case] if self.load_case is not None else None
+        op2 = read_op2(op2_name, build_dataframe=False,
+                       include_results=[RESULT_TABLES[result_type]], subcases=subcases)
+        results = op2.displacements if result_type == "displacement" else op2.cbush_force
+        if self.load_case is None:
+            self.load_case = list(results.keys())[0]
+        result = results[self.load_case]
+        ids = result.node_gridtype[:, 0] if result_type == "displacement" else result.element
+        return ids, result.data[0]
+
+    def extract_results_from_op2(self, op2_name, variables, result_type, response_sets=None):
+        """Extract variable values from OP2 file - unified function
+
+        Returns (variable_values, (ids, data)) where ids/data are the monitored and set rows
+        with all result columns, as kept in the response store; None on failure.
+        """
+        try:
+            ids, data = self.read_result_table(op2_name, result_type)
+            response_sets = response_sets or {}
+            # All monitored IDs are resolved at once and reduced in one numpy operation
+            values = response_variables(ids, data, variables, response_sets,
+                                        self.config.component, self.response_index)
+            variable_values = {key: float(value) for key, value in values.items()}
+
+            rows = [self.response_index.rows(ids, variables)]
+            rows += [self.response_index.set_rows(ids, name, ranges) for name, ranges in response_sets.items()]
+            rows = np.unique(np.concatenate(rows))
+            return variable_values, (ids[rows], data[rows])
+        except Exception as e:
+            self.log(f"Error extracting results from {op2_name}: {e}")
+            return None
+
+    def ask_tell_minimize(self, evaluate_batch, bounds, base_estimator, n_calls, n_initial, batch_size,
+                          x0=None, y0=None, checkpoint=None, warm_x=None, warm_y=None):
+        """Batch GP/GBRT minimization: the initial design is solved as one batch, then batch_size
+        constant-liar points at a time so every solver slot stays busy
+
+        x0/y0 are evaluations of an earlier session, told to the optimizer before it asks for new
+        points; the RNG state is saved to checkpoint after every batch and restored on resume.
+        warm_x/warm_y come from an earlier study: they are told first and replace initial points,
+        but do not count against n_calls.
+        """
+        from skopt import Optimizer
+        from skopt.space import Real
+        optimizer = Optimizer(
+            [Real(low, high) for low, high in bounds],
+            base_estimator=base_estimator,
+            n_initial_points=n_initial,
+            initial_point_generator=INITIAL_POINT_GENERATOR,
+            acq_func="gp_hedge" if base_estimator == "GP" else "EI",
+            random_state=RANDOM_SEED
+        )
+
+        evaluated = 0
+        prior = len(warm_x) if warm_x else 0
+        if warm_x:
+            optimizer.tell([list(x) for x in warm_x], list(warm_y))
+        if x0:
+            optimizer.tell([list(x) for x in x0], list(y0))
+            evaluated = len(x0)
+            saved = checkpoint.study['state'].get('rng') if checkpoint is not None else None
+            if saved:
+                name, keys, pos, has_gauss, cached = saved
+                optimizer.rng.set_state((name, np.array(keys, dtype=np.uint32), pos, has_gauss, cached))
+
+        while evaluated < n_calls:
+            n_points = n_initial - prior - evaluated if prior + evaluated < n_initial else batch_size
+            n_points = min(n_points, n_calls - evaluated)
+            points = optimizer.ask(n_points=n_points, strategy="cl_min")
+            objectives = evaluate_batch(points)
+            optimizer.tell(points, objectives)
+            evaluated += len(points)
+            if checkpoint is not None:
+                checkpoint.save_state(rng=rng_state(optimizer.rng))
+        return optimizer.get_result()
+
+    def load_warm_start(self, store_path, deck_hash, property_ids, bounds, variables, response_sets, result_type,
+                        objective_expr, mode, target, mass_limit):
+        """Designs of an earlier run re-scored for this study, as (x, y) lists for the optimizer
+
+        The stored responses are re-evaluated with the current objective, mode, target, component and
+        mass penalty. Designs outside the bounds or over the mass limit are dropped rather than clipped,
+        since their responses belong to the unclipped design.
+        """
+        study, iterations = ResponseStore(store_path).load()
+        if study.get('deck_hash') != deck_hash:
+            raise ValueError(f"Warm start store {store_path} was written for a different BDF")
+        if study['property_ids'] != property_ids or study['result_type'] != result_type:
+            raise ValueError(f"Warm start store {store_path} has different properties or result type")
+        stored_sets = {name: None if ranges is None else [tuple(r) for r in ranges]
+                       for name, ranges in study['response_sets'].items()}
+        if stored_sets != {name: None if ranges is None else list(ranges) for name, ranges in response_sets.items()}:
+            raise ValueError(f"Warm start store {store_path} has different response sets")
+        if not iterations:
+            return [], []
+
+        results, objectives = rescore_responses(iterations, variables, response_sets, self.config.component,
+                                                objective_expr, mode, target, study['initial_mass'],
+                                                self.config.mass_penalty_factor)
+        x = np.array([it['multipliers'] for it in iterations], dtype=float)
+        lows, highs = np.array(bounds).T
+        keep = np.all((x >= lows - 1e-12) & (x <= highs + 1e-12), axis=1) & np.isfinite(objectives)
+        if mass_limit is not None:
+            keep &= np.array([float(it['mass']) for it in iterations]) <= mass_limit
+
+        self.log(f"Warm start: {keep.sum()} of {len(iterations)} designs from {store_path} "
+                 f"(others outside the bounds or mass limit)")
+        if keep.any():
+            best = np.flatnonzero(keep)[np.argmin(objectives[keep])]
+            self.log(f"Warm start best: result {results[best]:.6f} "
+                     f"(iteration {iterations[best]['iteration']} of the earlier run)")
+        return np.clip(x[keep], lows, highs).tolist(), objectives[keep].tolist()
+
+    def run(self):
+        """Run the study to the end; raises StopIteration if stopped"""
+        config = self.config
+        pool = None
+        cache = None
+        archive = None
+        checkpoint = None
+        bdf = None
+        original_values = {}
+        case_control = None
+        resuming = self.resume_dir is not None
+        try:
+            path = config.bdf_path
+            variables = list(config.variables)
+            response_sets = config.response_ranges()
+            objective_expr = config.compile_objective()
+            result_type = config.result_type
+            component = config.component
+            self.log(f"Loading BDF file: {path}")
+            # Shared with the viewer through MODEL_CACHE: the properties and case control
+            # edited by the study are put back when it ends
+            model = MODEL_CACHE.get(path)
+            bdf = model.bdf
+
+            # The mass of an unchanged deck is kept in its model snapshot
+            initial_mass = model.mass
+            if initial_mass is None:
+                initial_mass = self.get_mass(bdf)
+                if initial_mass is not None:
+                    model.record_mass(initial_mass)
+            self.initial_mass = initial_mass
+            if initial_mass is not None:
+                self.log(f"Initial mass: {initial_mass:.2f}")
+                self.mass(initial_mass)
+
+            all_property_ids = list(bdf.properties.keys())
+            self.log(f"Total properties in model: {len(all_property_ids)}")
+
+            selected_property_ids, missing = select_properties(config.property_selection, all_property_ids)
+            for pid in missing:
+                self.log(f"Warning: Property {pid} not found in model")
+            self.log(f"Selected {len(selected_property_ids)} properties for optimization")
+
+            original_values = {}
+            property_ids = []
+            for pid in selected_property_ids:
+                if pid not in bdf.properties:
+                    continue
+                prop = bdf.properties[pid]
+                property_ids.append(pid)
+                if prop.type == "PSHELL":
+                    original_values[pid] = ('PSHELL', prop.t)
+                elif prop.type == "PCOMP":
+                    original_values[pid] = ('PCOMP', prop.thicknesses[0])
+                elif prop.type == "PBARL":
+                    original_values[pid] = ('PBARL', prop.dim[0])
+                else:
+                    original_values[pid] = None
+                    self.log(f"Warning: Property {pid} type {prop.type} is not supported")
+
+            if not property_ids:
+                raise ValueError("No valid properties selected for optimization")
+
+            self.log(f"Optimizing {len(property_ids)} properties")
+
+            mass_model = None
+            mass_check_every = max(0, config.mass_check_every)
+            if initial_mass is not None:
+                try:
+                    reused = sum(pid in model.mass_coefficients for pid in property_ids)
+                    mass_model = MassModel(bdf, property_ids, original_values, initial_mass, model.mass_coefficients)
+                    model.record_mass_coefficients(dict(zip(property_ids, mass_model.coefficients.tolist())))
+                    self.log(f"Analytic mass model: fixed mass {mass_model.fixed_mass:.2f}, "
+                             f"{len(property_ids)} property terms" + (f" ({reused} from the model snapshot)" if reused else ""))
+                except Exception as e:
+                    self.log(f"Warning: analytic mass model unavailable, using full mass calculation: {e}")
+            mass_limit = config.mass_limit_for(initial_mass)
+            if config.mass_limit is not None and initial_mass is None:
+                raise ValueError("A mass limit is set but the model mass could not be calculated")
+            self.log(f"Result type: {result_type.upper()}, Component: {component.upper()}")
+
+            iteration = [0]
+            completed = [0]
+            mode = config.mode
+            target = config.target_value
+            best_result = [float('inf') if mode == 'minimize' else float('-inf')]
+            best_multipliers = [None]
+            best_mass = [None]
+
+            deck_hash = deck_sha256(bdf, path)
+            bounds = [(config.min_bound, config.max_bound)] * len(property_ids)
+            if not resuming:
+                self.run_dir = new_run_dir()
+            self.log(f"Study directory: {os.path.abspath(self.run_dir)}")
+            # Job directories and the incremental master of each study live in their own
+            # subdirectory, so studies sharing a job root never touch each other's files
+            job_root = os.path.join(config.job_root or JOB_ROOT, os.path.basename(os.path.abspath(self.run_dir)))
+            pool = SolverPool(config.nastran_path, config.max_solves, job_root, config.scratch_dir)
+            solve_timeout = config.solve_timeout or None
+            solve_retries = max(0, config.solve_retries)
+            retry_memory = list(config.retry_memory)
+
+            if config.use_cache:
+                response_spec = [result_type, component, variables,
+                                 {name: ranges for name, ranges in response_sets.items()}]
+                cache = EvaluationCache(CACHE_FILE, deck_hash, property_ids, response_spec,
+                                        config.cache_tolerance, config.cache_size)
+                self.log(f"Evaluation cache: {os.path.abspath(CACHE_FILE)}")
+            self.log(f"Solver pool: up to {pool.max_solves} concurrent Nastran jobs in {pool.root}"
+                     + (f", scratch in {pool.scratch}" if pool.scratch else ""))
+
+            if config.trim_output:
+                if bdf.case_control_deck is None:
+                    self.log("Warning: output not trimmed, the BDF has no case control deck")
+                else:
+                    case_control = copy.deepcopy(bdf.case_control_deck)
+                    if result_type == "displacement":
+                        available = np.array(sorted(bdf.nodes), dtype=int)
+                    else:
+                        available = np.array(sorted(eid for eid, elem in bdf.elements.items()
+                                                    if elem.type == "CBUSH"), dtype=int)
+                    output_ids = set(variables)
+                    for ranges in response_sets.values():
+                        if ranges is None:
+                            output_ids = None
+                            break
+                        output_ids.update(available[ids_in_ranges(available, ranges)].tolist())
+                    set_id = trim_output_requests(bdf.case_control_deck, result_type, output_ids)
+                    self.log(f"Output trimmed to {RESULT_REQUESTS[result_type]}(PLOT) = "
+                             + (f"SET {set_id} ({len(output_ids)} IDs)" if set_id else "ALL"))
+
+            deck_writer = None
+            if config.incremental_decks:
+                edited_ids = [pid for pid in property_ids if original_values[pid] is not None]
+                deck_writer = IncrementalDeckWriter(bdf, edited_ids, pool.root)
+                self.log(f"Incremental decks: master written to {deck_writer.master}, "
+                         f"{len(edited_ids)} property cards per iteration")
+
+            archive = DesignArchive(os.path.join(self.run_dir, KEEP_ROOT), config.keep_best, config.compress_kept,
+                                    deck_writer.master if deck_writer is not None else None)
+            self.log(f"Keeping the {archive.keep} best designs in {archive.root}"
+                     + (", demoted designs compressed" if archive.compress else ""))
+
+            warm_x, warm_y = [], []
+            if config.warm_start and not resuming:
+                warm_x, warm_y = self.load_warm_start(config.warm_start, deck_hash, property_ids, bounds, variables,
+                                                      response_sets, result_type, objective_expr, mode, target,
+                                                      config.mass_limit_for(initial_mass))
+
+            response_file = os.path.join(self.run_dir, RESPONSE_FILE)
+            response_store = ResponseStore(response_file, None if resuming and os.path.exists(response_file) else {
+                'bdf': path, 'deck_hash': deck_hash, 'result_type': result_type,
+                'component': component, 'variables': variables,
+                'response_sets': {name: ranges for name, ranges in response_sets.items()},
+                'property_ids': property_ids, 'initial_mass': initial_mass,
+                'columns': RESULT_COLUMNS[result_type]})
+            self.log(f"Response store: {os.path.abspath(response_file)}")
+
+            self.log("=" * 50)
+            self.log("Starting optimization...")
+            self.log("=" * 50)
+
+            project_mass = config.mass_limit_action == "Project"
+            if mass_limit is not None:
+                self.log(f"Mass limit: {mass_limit:.2f} ({'project' if project_mass else 'reject'} violating designs"
+                         + (", full mass calculation per check)" if mass_model is None else ")"))
+
+            # The deck thread and the exact mass check both set multipliers on the shared model
+            model_lock = threading.Lock()
+
+            def apply_design(multipliers):
+                for i, pid in enumerate(property_ids):
+                    if original_values[pid] is None:
+                        continue
+                    apply_multiplier(bdf.properties[pid], original_values[pid], multipliers[i])
+
+            def design_mass(multipliers):
+                """Mass of a design from the analytic model, or from mass_properties without one"""
+                if mass_model is not None:
+                    return mass_model.mass(multipliers)
+                with model_lock:
+                    apply_design(multipliers)
+                    mass = self.get_mass(bdf)
+                return float('inf') if mass is None else mass
+
+            def screen_mass(multipliers):
+                """Return the design to solve under the mass limit, or None if it must be rejected"""
+                x = np.asarray(multipliers, dtype=float)
+                if mass_limit is None or design_mass(x) <= mass_limit:
+                    return multipliers
+                if not project_mass:
+                    return None
+                # Move towards the lightest design (all multipliers at the lower bound)
+                # and keep the largest step that still meets the limit
+                x_min = np.array([low for low, _ in bounds])
+                if design_mass(x_min) > mass_limit:
+                    return None
+                lo, hi = 0.0, 1.0
+                for _ in range(50 if mass_model is not None else 20):
+                    mid = 0.5 * (lo + hi)
+                    if design_mass(x_min + mid * (x - x_min)) <= mass_limit:
+                        lo = mid
+                    else:
+                        hi = mid
+                return list(x_min + lo * (x - x_min))
+
+            def new_job(multipliers):
+                iteration[0] += 1
+                return {'iteration': iteration[0], 'multipliers': list(multipliers), 'x': list(multipliers),
+                        'mass': None, 'dir': None, 'status': STATUS_OK, 'attempts': 0}
+
+            def write_deck(job):
+                """Apply the job's multipliers to the model and write its deck into a fresh job directory
+                (caller holds model_lock)"""
+                apply_design(job['multipliers'])
+                job['dir'] = pool.job_dir(f"opt_{job['iteration']}")
+                job['bdf'] = os.path.join(job['dir'], f"opt_{job['iteration']}.bdf")
+                if deck_writer is not None:
+                    deck_writer.write(job['bdf'])
+                else:
+                    bdf.write_bdf(job['bdf'])
+
+            def prepare_job(job):
+                """Write the job's deck and set its mass"""
+                current_iter = job['iteration']
+                multipliers = job['multipliers']
+                with model_lock:
+                    write_deck(job)
+
+                    if mass_model is not None:
+                        job['mass'] = mass_model.mass(multipliers)
+                        if mass_check_every and current_iter % mass_check_every == 0:
+                            full_mass = self.get_mass(bdf)
+                            if full_mass is not None:
+                                error = abs(job['mass'] - full_mass) / abs(full_mass) if full_mass else 0.0
+                                self.log(f"Mass check (iteration {current_iter}): analytic {job['mass']:.5f}, "
+                                         f"full {full_mass:.5f}, rel. error {error:.2e}")
+                                job['mass'] = full_mass
+                    else:
+                        job['mass'] = self.get_mass(bdf)
+
+            finished = queue.Queue()
+
+            def deck_stage(job):
+                """Write the job's deck and hand it to the solvers (deck thread)"""
+                try:
+                    prepare_job(job)
+                except Exception as e:
+                    self.log(f"ERROR in iteration {job['iteration']}: {e}")
+                    job['status'] = STATUS_ERROR
+                    finished.put((job, None))
+                    return
+                pool.submit(solve_stage, job)
+
+            def solve_stage(job):
+                """Run Nastran on a prepared job with timeout and retries, then queue it for parsing (pool thread)"""
+                try:
+                    while True:
+                        attempt = job['attempts']
+                        job['attempts'] += 1
+                        memory = retry_memory[min(attempt, len(retry_memory)) - 1] if attempt and retry_memory else None
+                        if attempt:
+                            clear_nastran_outputs(job['bdf'])
+                            self.log(f"Retrying iteration {job['iteration']} ({job['status']}), "
+                                     f"attempt {attempt + 1}/{solve_retries + 1}"
+                                     + (f", memory={memory}" if memory else ""))
+
+                        args = pool.args + ((f"memory={memory}",) if memory else ())
+                        nastran_job = NastranJob(pool.nastran_path, job['bdf'], args)
+                        status = nastran_job.wait(timeout=solve_timeout)
+                        if nastran_job.unfinished:
+                            # The detached solver may still be writing to this directory: no retry
+                            job['status'] = STATUS_TIMEOUT
+                            self.log(f"Iteration {job['iteration']} timed out without an END OF JOB marker, "
+                                     f"its detached solver could not be killed and is not retried")
+                            finished.put((job, None))
+                            return
+                        elif nastran_job.timed_out:
+                            job['status'] = STATUS_TIMEOUT
+                            self.log(f"Iteration {job['iteration']} timed out"
+                                     + (f" after {solve_timeout:.0f} s" if solve_timeout else "") + ", job killed")
+                        elif nastran_job.fatal:
+                            job['status'] = STATUS_FATAL
+                            self.log(f"Nastran reported a FATAL message in iteration {job['iteration']}")
+                        else:
+                            if status != 0:
+                                self.log(f"Warning: Nastran exited with status {status} in iteration {job['iteration']}")
+                            pool.submit_parse(parse_stage, job)
+                            return
+                        if job['attempts'] > solve_retries:
+                            finished.put((job, None))
+                            return
+                except Exception as e:
+                    self.log(f"ERROR in iteration {job['iteration']}: {e}")
+                    job['status'] = STATUS_ERROR
+                    finished.put((job, None))
+
+            def parse_stage(job):
+                """Extract the responses of a solved job, or send it back for a retry (parse thread)"""
+                op2_name = os.path.splitext(job['bdf'])[0] + ".op2"
+                try:
+                    extracted = self.extract_results_from_op2(op2_name, variables, result_type, response_sets)
+                except Exception as e:
+                    self.log(f"ERROR in iteration {job['iteration']}: {e}")
+                    extracted = None
+                if extracted is None:
+                    job['status'] = STATUS_NO_RESULTS
+                    if job['attempts'] <= solve_retries:
+                        pool.submit(solve_stage, job)
+                        return
+                    finished.put((job, None))
+                    return
+                job['status'] = STATUS_OK
+                variable_values, job['responses'] = extracted
+                finished.put((job, variable_values))
+
+            def record_failure(job):
+                """Record a failed evaluation with its reason code (optimizer thread)"""
+                completed[0] += 1
+                self.log(f"Iteration {job['iteration']} failed: {job['status']} "
+                         f"after {job['attempts']} attempt(s)")
+                checkpoint.append(job['x'], FAILED_OBJECTIVE, {
+                    'Iteration': job['iteration'],
+                    'Result': float('nan'),
+                    'Status': job['status'],
+                    'Attempts': job['attempts'],
+                    'Mass': job['mass'],
+                    'Multipliers': list(job['multipliers'])
+                })
+                if job['dir']:
+                    pool.remove_job(job['dir'])
+                return FAILED_OBJECTIVE
+
+            def record_result(job, variable_values):
+                """Score a finished job and update history and best tracking (optimizer thread)"""
+                if job['status'] not in (STATUS_OK, STATUS_CACHED):
+                    return record_failure(job)
+
+                current_iter = job['iteration']
+                current_mass = job['mass']
+                multipliers = job['multipliers']
+
+                result = objective_expr(variable_values)
+                objective = apply_mass_penalty(score_results(result, mode, target), current_mass, mode,
+                                               initial_mass, config.mass_penalty_factor)
+
+                score = score_results(result, mode, target)
+                if job['dir'] is None and archive.ranks(score):
+                    # A cache hit entering the top K gets its deck written, so the kept design exists
+                    with model_lock:
+                        write_deck(job)
+                kept = archive.offer(current_iter, score, job['dir']) if job['dir'] else None
+                completed[0] += 1
+                is_new_best = is_better(result, best_result[0], mode, target)
+                if is_new_best:
+                    best_result[0] = result
+                    best_multipliers[0] = list(multipliers)
+                    best_mass[0] = current_mass
+                    self.best_bdf_name = os.path.join(kept, os.path.basename(job['bdf'])) if kept else None
+
+                self.progress(completed[0], current_iter, result, best_result[0], current_mass, is_new_best)
+
+                if cache is not None and job['status'] == STATUS_OK:
+                    cache.put(multipliers, variable_values, current_mass, job['responses'])
+                if job.get('responses') is not None:
+                    response_store.append(current_iter, *job.pop('responses'), current_mass, multipliers)
+
+                if not kept and job['dir']:
+                    pool.remove_job(job['dir'])
+
+                checkpoint.append(job['x'], objective, {
+                    'Iteration': current_iter,
+                    'Result': result,
+                    'Status': job['status'],
+                    'Attempts': job['attempts'],
+                    'Mass': current_mass,
+                    **variable_values,
+                    'Multipliers': list(multipliers)
+                })
+                return objective
+
+            def record_evaluation(job, variable_values):
+                """record_result, with an evaluation that cannot be scored or stored recorded as an error"""
+                try:
+                    return record_result(job, variable_values)
+                except Exception as e:
+                    self.log(f"ERROR in iteration {job['iteration']}: {e}")
+                    job['status'] = STATUS_ERROR
+                    return record_failure(job)
+
+            def evaluate_batch(candidates):
+                """Evaluate several designs concurrently; objectives are returned in candidate order"""
+                if self.stopped.is_set():
+                    raise StopIteration("Optimization stopped by user")
+
+                objectives = [FAILED_OBJECTIVE] * len(candidates)
+                pending = 0
+                for idx, multipliers in enumerate(candidates):
+                    screened = screen_mass(multipliers)
+                    if screened is None:
+                        job = new_job(multipliers)
+                        job['mass'] = design_mass(multipliers)
+                        job['status'] = STATUS_MASS_REJECTED
+                        objectives[idx] = record_failure(job)
+                        continue
+                    job = new_job(screened)
+                    job['x'] = list(multipliers)
+                    if screened is not multipliers:
+                        self.log(f"Iteration {job['iteration']}: design projected onto the mass limit")
+                    cached = cache.get(job['multipliers']) if cache is not None else None
+                    if cached is not None:
+                        variable_values, job['mass'], job['responses'] = cached
+                        job['status'] = STATUS_CACHED
+                        job['bdf'] = None
+                        self.log(f"Iteration {job['iteration']}: design found in cache, solve skipped")
+                        objectives[idx] = record_evaluation(job, variable_values)
+                        continue
+                    job['index'] = idx
+                    pool.submit_deck(deck_stage, job)
+                    pending += 1
+
+                # Deck writing, solving and parsing overlap across the batch; results are fed
+                # back as soon as each job leaves the pipeline
+                for _ in range(pending):
+                    job, variable_values = finished.get()
+                    objectives[job['index']] = record_evaluation(job, variable_values)
+                return objectives
+
+            method = config.method
+            n_calls_val = config.n_calls
+
+            self.log(f"Using optimization method: {method}")
+            self.log(f"Target iterations: {n_calls_val}")
+
+            # ==================== CHECKPOINT ====================
+            records = []
+            if resuming:
+                checkpoint = StudyCheckpoint(self.resume_dir)
+                if checkpoint.study['deck_hash'] != deck_hash or checkpoint.study['property_ids'] != property_ids:
+                    raise ValueError("The BDF or the selected properties changed since the checkpoint was written, "
+                                     "start a new study instead")
+                records = checkpoint.evaluations()
+                warm_x, warm_y = checkpoint.study.get('warm_start', ([], []))
+            else:
+                checkpoint = StudyCheckpoint(os.path.join(self.run_dir, CHECKPOINT_DIR), {
+                    'config': config.to_dict(), 'bdf': path, 'deck_hash': deck_hash,
+                    'property_ids': property_ids, 'bounds': bounds, 'method': method, 'seed': RANDOM_SEED,
+                    'warm_start': [warm_x, warm_y]},
+                    history_columns(response_variable_names(variables, response_sets), len(property_ids)))
+            self.log(f"Checkpoint: {checkpoint.root}")
+
+            # Replay the evaluations of the earlier session into the bookkeeping, nothing is re-solved
+            for record in records:
+                row = record['row']
+                iteration[0] = max(iteration[0], row['Iteration'])
+                completed[0] += 1
+                if row['Status'] not in (STATUS_OK, STATUS_CACHED):
+                    continue
+                result = row['Result']
+                current_mass = row['Mass']
+                kept = archive.adopt(row['Iteration'], score_results(result, mode, target), f"opt_{row['Iteration']}")
+                is_new_best = is_better(result, best_result[0], mode, target)
+                if is_new_best:
+                    best_result[0] = result
+                    best_multipliers[0] = row['Multipliers']
+                    best_mass[0] = current_mass
+                    self.best_bdf_name = os.path.join(kept, f"opt_{row['Iteration']}.bdf") if kept else None
+                self.progress(completed[0], row['Iteration'], result, best_result[0], current_mass, is_new_best)
+            if records:
+                self.log(f"Resumed {len(records)} evaluations, continuing at iteration {iteration[0] + 1}")
+
+            if method in ("Gaussian Process", "Boosted Trees"):
+                n_initial = min(5, max(3, n_calls_val // 3))
+                base_estimator = "GP" if method == "Gaussian Process" else "GBRT"
+                self.log(f"{base_estimator} ask/tell: n_calls={n_calls_val}, n_initial={n_initial} "
+                         f"({INITIAL_POINT_GENERATOR}), batch size={pool.max_solves}")
+                result = self.ask_tell_minimize(
+                    evaluate_batch,
+                    bounds,
+                    base_estimator,
+                    n_calls=n_calls_val,
+                    n_initial=n_initial,
+                    batch_size=pool.max_solves,
+                    x0=[record['x'] for record in records],
+                    y0=[record['y'] for record in records],
+                    checkpoint=checkpoint,
+                    warm_x=warm_x,
+                    warm_y=warm_y
+                )
+
+            elif method == "Differential Evo":
+                from scipy.optimize import differential_evolution
+                from scipy.stats import qmc
+                # The population size is fixed through an explicit Latin hypercube initial
+                # population, so DE makes population * (maxiter + 1) calls; the last
+                # generation is trimmed to the remaining budget
+                n_params = len(property_ids)
+                population = max(5, min(15 * n_params, n_calls_val // 4))
+                # Warm start members of the initial population are not solved again
+                n_warm = min(len(warm_x), population)
+                maxiter = max(1, -(-(n_calls_val + n_warm) // population) - 1)
+                planned_calls = population * (maxiter + 1) - n_warm
+
+                lows, highs = zip(*bounds)
+                sampler = qmc.LatinHypercube(d=n_params, seed=RANDOM_SEED)
+                init_population = qmc.scale(sampler.random(population), lows, highs)
+                # The best warm start designs take the place of Latin hypercube members
+                if n_warm:
+                    init_population[:n_warm] = np.asarray(warm_x)[np.argsort(warm_y)[:n_warm]]
+                    self.log(f"{n_warm} of {population} initial members taken from the warm start")
+
+                self.log(f"Differential Evolution: population={population} (one batch per generation), maxiter={maxiter}")
+                self.log(f"Planned function calls: {min(planned_calls, n_calls_val)} (target: {n_calls_val})")
+
+                # DE is deterministic for a given seed, so a resumed run asks for the same
+                # designs again; those already evaluated are answered from the checkpoint, as
+                # are the warm start members
+                replay = {tuple(np.round(x, 12)): y for x, y in zip(warm_x, warm_y)}
+                replay.update((tuple(np.round(record['x'], 12)), record['y']) for record in records)
+
+                def population_objective(members):
+                    # vectorized=True: members is (n_params, S), one column per design
+                    candidates = list(members.T)
+                    energies = np.full(len(candidates), FAILED_OBJECTIVE)
+                    pending = []
+                    for idx, candidate in enumerate(candidates):
+                        key = tuple(np.round(candidate, 12))
+                        if key in replay:
+                            energies[idx] = replay.pop(key)
+                        else:
+                            pending.append(idx)
+                    pending = pending[:max(0, n_calls_val - iteration[0])]
+                    if pending:
+                        energies[pending] = evaluate_batch([candidates[idx] for idx in pending])
+                    return energies
+
+                def de_callback(xk, convergence):
+                    if self.stopped.is_set():
+                        self.log("Stopping: optimization halted by user")
+                        return True
+                    if iteration[0] >= n_calls_val:
+                        self.log(f"Stopping: reached target of {n_calls_val} evaluations")
+                        return True
+                    return False
+
+                result = differential_evolution(
+                    population_objective,
+                    bounds,
+                    maxiter=maxiter,
+                    init=init_population,
+                    seed=RANDOM_SEED,
+                    polish=False,
+                    vectorized=True,
+                    updating='deferred',
+                    callback=de_callback,
+                    atol=0.001,
+                    tol=0.01
+                )
+                # A stop ends DE through its callback, which returns normally: report it like
+                # the GP/GBRT loops do, so the study is left resumable rather than completed
+                if self.stopped.is_set():
+                    raise StopIteration("Optimization stopped by user")
+            else:
+                raise ValueError(f"Unknown optimization method: {method}")
+
+            if best_multipliers[0] is not None:
+                self.log(f"Best result: {best_result[0]:.6f}"
+                         + (f", mass {best_mass[0]:.2f}" if best_mass[0] is not None else "")
+                         + (f", design {self.best_bdf_name}" if self.best_bdf_name else ""))
+            self.save_results(property_ids, original_values, best_multipliers[0],
+                              checkpoint.history, best_result[0], best_mass[0])
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel=True)
+            if cache is not None:
+                cache.close()
+            if archive is not None:
+                archive.close()
+            if checkpoint is not None:
+                checkpoint.close()
+            if bdf is not None:
+                for pid, original in original_values.items():
+                    if original is not None:
+                        apply_multiplier(bdf.properties[pid], original, 1.0)
+                if case_control is not None:
+                    bdf.case_control_deck = case_control
+
+    def save_results(self, property_ids, original_values, best_multipliers, history, best_result, best_mass):
+        """Excel summary of a finished study; history is its HistoryStore, which already holds every row"""
+        config = self.config
+        self.log(f"History of {len(history)} evaluations stored in {history.root}")
+        if not config.excel_report:
+            return
+        import pandas as pd
+        results_data = []
+        for i, pid in enumerate(property_ids):
+            if original_values[pid] is None or best_multipliers is None:
+                continue
+            attr_name, original = original_values[pid]
+            multiplier = best_multipliers[i]
+            results_data.append({
+                'PID': pid,
+                'Property_Type': attr_name,
+                'Multiplier': multiplier,
+                'Original_Value': original,
+                'New_Value': original * multiplier
+            })
+
+        df_results = pd.DataFrame(results_data)
+        # A summary only: the best evaluations and the status counts. Every row, with the
+        # multipliers, stays in the history store
+        df_history = history.to_frame()
+        solved = df_history[df_history['Status'].isin([STATUS_OK, STATUS_CACHED])]
+        df_best = solved.sort_values('Objective', kind='stable').head(REPORT_BEST_ROWS)
+        df_status = df_history['Status'].value_counts().rename_axis('Status').reset_index(name='Count')
+
+        summary_data = {
+            'Parameter': [
+                'Best Result Value', 'Best BDF File', 'Optimization Mode', 'Target Value',
+                'Total Iterations', 'Result Type', 'Component', 'Load Case',
+                'Objective Function', 'Properties Optimized', 'Property Selection',
+                'Mass Penalty Enabled', 'Mass Penalty Factor', 'Initial Mass',
+                'Best Solution Mass', 'Mass Change (%)', 'History'
+            ],
+            'Value': [
+                f"{best_result:.6f}",
+                self.best_bdf_name if self.best_bdf_name else "N/A",
+                config.mode,
+                f"{config.target}" if config.mode == 'target' else "N/A",
+                len(history),
+                config.result_type,
+                config.component.upper(),
+                self.load_case,
+                config.objective,
+                len(property_ids),
+                config.property_selection,
+                "Yes" if config.mass_penalty_factor is not None else "No",
+                f"{config.mass_penalty_factor}" if config.mass_penalty_factor is not None else "N/A",
+                f"{self.initial_mass:.2f}" if self.initial_mass else "N/A",
+                f"{best_mass:.2f}" if best_mass else "N/A",
+                f"{((best_mass - self.initial_mass) / self.initial_mass * 100):+.2f}%" if (self.initial_mass and best_mass) else "N/A",
+                os.path.abspath(history.root)
+            ]
+        }
+        df_summary = pd.DataFrame(summary_data)
+
+        results_file = os.path.join(self.run_dir, RESULTS_FILE)
+        with pd.ExcelWriter(results_file, engine='openpyxl') as writer:
+            df_summary.to_excel(writer, sheet_name='Summary', index=False)
+            df_results.to_excel(writer, sheet_name='Best_Solution', index=False)
+            df_best.to_excel(writer, sheet_name='Best_Designs', index=False)
+            df_status.to_excel(writer, sheet_name='Status_Counts', index=False)
+        self.log(f"Results saved to {os.path.abspath(results_file)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run CLONE1600 optimization studies without the GUI")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="run a study described by a JSON, YAML or TOML file")
+    run_parser.add_argument("study", help="study file, e.g. study.yaml")
+    resume_parser = commands.add_parser("resume", help="continue an interrupted study from its checkpoint")
+    resume_parser.add_argument("checkpoint", nargs="?",
+                               help=f"checkpoint directory (default: that of the latest study in {RUN_ROOT})")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "run":
+            engine = OptimizationEngine(StudyConfig.from_file(args.study))
+        else:
+            checkpoint = args.checkpoint or latest_checkpoint()
+            engine = OptimizationEngine(StudyConfig.from_checkpoint(checkpoint), resume_dir=checkpoint)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    try:
+        engine.run()
+    except (StopIteration, KeyboardInterrupt):
+        if engine.run_dir is None:
+            log_message("Optimization stopped")
+        else:
+            checkpoint = engine.resume_dir or os.path.join(engine.run_dir, CHECKPOINT_DIR)
+            log_message(f"Optimization stopped, continue with: python clone1600_engine.py resume {checkpoint}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())